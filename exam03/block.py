@@ -1,22 +1,76 @@
 # block.py
 import hashlib
+import math
+import sys
 import time
+from merkle import merkle_root, merkle_proof
+from keys import sign, verify
+
+
+def _to_raw(value):
+    # 64자리 hex 해시는 32바이트로 보관 (그 외 "0", None 등은 그대로)
+    if isinstance(value, str) and len(value) == 64:
+        try:
+            raw = bytes.fromhex(value)
+        except ValueError:
+            return value
+        if raw.hex() == value:
+            return raw
+    return value
+
+
+def _to_hex(value):
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def _intern(address):
+    # 같은 주소 문자열은 하나의 객체를 공유
+    return sys.intern(address) if type(address) is str else address
+
 
 class Transaction:
-    def __init__(self, sender, receiver, amount):
-        self.sender = sender
-        self.receiver = receiver
+    # 트랜잭션이 매우 많이 메모리에 올라가므로 __dict__ 없이 __slots__ 사용
+    # 주소는 Ed25519 공개키 hex (keys.py), 보내는 사람의 개인키로 서명해야 함 (채굴 보상 제외)
+    __slots__ = ("sender", "receiver", "amount", "fee", "signature")
+
+    def __init__(self, sender, receiver, amount, fee=0, signature=None):
+        self.sender = _intern(sender)
+        self.receiver = _intern(receiver)
         self.amount = amount
+        self.fee = fee  # 채굴자가 받는 수수료 (높을수록 먼저 블록에 담김)
+        self.signature = signature  # 서명 hex (tx-id에는 포함되지 않음)
 
     def is_valid(self):
-        # 간단한 검증: 금액이 양수인지 확인
-        return self.amount > 0
+        # 금액은 양수, 수수료는 0 이상인 유한한 숫자이고, 채굴 보상이 아니면 보내는 주소의 서명이 맞아야 함
+        for value in (self.amount, self.fee):
+            if type(value) not in (int, float) or not math.isfinite(value):
+                return False
+        if self.amount <= 0 or self.fee < 0:
+            return False
+        if self.sender == "System":
+            return True
+        return self.signature is not None and verify(self.sender, self.signing_bytes(), self.signature)
+
+    def signing_bytes(self):
+        # 서명과 tx-id의 대상이 되는 정규(canonical) 인코딩
+        # 주소는 길이를 앞에 붙이고 금액/수수료는 ':'로 나누어 경계가 모호하지 않게 함
+        return f"{len(self.sender)}:{self.sender}{len(self.receiver)}:{self.receiver}{self.amount!r}:{self.fee!r}".encode()
+
+    def calculate_hash(self):
+        return hashlib.sha256(self.signing_bytes()).hexdigest()
+
+    def sign(self, private_key):
+        self.signature = sign(private_key, self.signing_bytes())
+        return self
 
     def __repr__(self):
         return f"Transaction(from={self.sender}, to={self.receiver}, amount={self.amount})"
 
 
 class Block:
+    # 해시는 내부에 32바이트 bytes로 보관하고, hash/previous_hash/merkle_root 속성으로는 hex 문자열을 돌려줌
+    __slots__ = ("index", "timestamp", "_transactions", "_merkle_root", "_previous_hash", "_hash")
+
     def __init__(self, index, timestamp, transactions, previous_hash):
         self.index = index
         self.timestamp = timestamp
@@ -25,10 +79,47 @@ class Block:
         self.previous_hash = previous_hash
         self.hash = None  # 해시는 set_hash()에서 계산
 
+    @property
+    def hash(self):
+        return _to_hex(self._hash)
+
+    @hash.setter
+    def hash(self, value):
+        self._hash = _to_raw(value)
+
+    @property
+    def previous_hash(self):
+        return _to_hex(self._previous_hash)
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self._previous_hash = _to_raw(value)
+
+    @property
+    def transactions(self):
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, transactions):
+        # 트랜잭션이 바뀌면 캐시된 머클 루트를 무효화
+        # (리스트를 직접 수정하지 말고 새 리스트를 대입할 것)
+        self._transactions = transactions
+        self._merkle_root = None
+
+    @property
+    def merkle_root(self):
+        # 트랜잭션 해시들의 머클 루트 (한 번만 계산해서 캐시)
+        if self._merkle_root is None:
+            self._merkle_root = _to_raw(merkle_root([tx.calculate_hash() for tx in self._transactions]))
+        return _to_hex(self._merkle_root)
+
+    def merkle_proof(self, tx_index):
+        # tx_index번째 트랜잭션의 포함 증명 (merkle.verify_proof로 검증)
+        return merkle_proof([tx.calculate_hash() for tx in self._transactions], tx_index)
+
     def calculate_hash(self):
-        # 트랜잭션 리스트를 문자열로 변환
-        tx_str = "".join([f"{tx.sender}{tx.receiver}{tx.amount}" for tx in self.transactions])
-        block_string = f"{self.index}{self.timestamp}{tx_str}{self.previous_hash}"
+        # 트랜잭션 전체 대신 머클 루트로 블록 해시 계산
+        block_string = f"{self.index}{self.timestamp}{self.merkle_root}{self.previous_hash}"
         return hashlib.sha256(block_string.encode()).hexdigest()
 
     def set_hash(self):
@@ -36,14 +127,15 @@ class Block:
 
 
 class BlockWithProof(Block):
+    __slots__ = ("nonce", "difficulty")
+
     def __init__(self, index, timestamp, transactions, previous_hash, difficulty=4):
         super().__init__(index, timestamp, transactions, previous_hash)
         self.nonce = 0
         self.difficulty = difficulty
 
     def calculate_hash(self):
-        tx_str = "".join([f"{tx.sender}{tx.receiver}{tx.amount}" for tx in self.transactions])
-        block_string = f"{self.index}{self.timestamp}{tx_str}{self.previous_hash}{self.nonce}"
+        block_string = f"{self.index}{self.timestamp}{self.merkle_root}{self.previous_hash}{self.nonce}"
         return hashlib.sha256(block_string.encode()).hexdigest()
 
     def mine_block(self):
@@ -1,11 +1,13 @@
 # blockchain.py
 import time
 from block import Block, BlockWithProof, Transaction
+from mempool import Mempool
 
 class Blockchain:
-    def __init__(self):
+    def __init__(self, mempool_size=10000, max_block_transactions=1000):
         self.chain = [self.create_genesis_block()]
-        self.pending_transactions = []  # 아직 블록에 담지 않은 트랜잭션 목록
+        self.mempool = Mempool(mempool_size)  # 아직 블록에 담지 않은 트랜잭션 (중복 제거, 수수료 우선)
+        self.max_block_transactions = max_block_transactions  # 블록 하나에 담을 최대 트랜잭션 수
         self.mining_reward = 50  # 블록 채굴 시 보상 (가상화폐 발행 개념 예시)
 
     def create_genesis_block(self):
@@ -25,6 +27,10 @@ class Blockchain:
                 return False
             if current_block.previous_hash != previous_block.hash:
                 return False
+            # 같은 트랜잭션이 두 번 들어 있으면 머클 루트가 같아도 다른 블록이므로 거부
+            tx_ids = [tx.calculate_hash() for tx in current_block.transactions]
+            if len(set(tx_ids)) != len(tx_ids):
+                return False
         return True
 
     def add_transaction(self, transaction):
@@ -32,20 +38,20 @@ class Blockchain:
         if not transaction.is_valid():
             print("Invalid transaction. Not added.")
             return False
-        self.pending_transactions.append(transaction)
-        return True
+        # 이미 풀에 있는 트랜잭션이면 추가하지 않음
+        return self.mempool.add(transaction)
 
     def create_block_from_pending(self):
         # 대기중인 트랜잭션을 담은 블록을 생성하고 체인에 추가
         new_block = Block(
             index=len(self.chain),
             timestamp=time.time(),
-            transactions=self.pending_transactions[:],  # 복사
+            transactions=self.mempool.select(self.max_block_transactions),  # 수수료 높은 순
             previous_hash=self.get_latest_block().hash
         )
         new_block.set_hash()
         self.chain.append(new_block)
-        self.pending_transactions = []  # 대기중인 트랜잭션 초기화
+        self.mempool.remove_block(new_block)  # 블록에 담긴 트랜잭션 제거
         return new_block
 
 
@@ -58,12 +64,11 @@ class BlockchainWithPoW(Blockchain):
         # 대기중인 트랜잭션을 담은 BlockWithProof 생성
         # 채굴 보상을 위한 트랜잭션 추가 (miner_address에 보상 지급)
         reward_tx = Transaction("System", miner_address, self.mining_reward)
-        self.pending_transactions.append(reward_tx)
 
         new_block = BlockWithProof(
             index=len(self.chain),
             timestamp=time.time(),
-            transactions=self.pending_transactions[:],
+            transactions=self.mempool.select(self.max_block_transactions) + [reward_tx],
             previous_hash=self.get_latest_block().hash,
             difficulty=self.difficulty
         )
@@ -72,5 +77,5 @@ class BlockchainWithPoW(Blockchain):
         new_block.mine_block()
 
         self.chain.append(new_block)
-        self.pending_transactions = []  # 대기중 트랜잭션 초기화
+        self.mempool.remove_block(new_block)  # 블록에 담긴 트랜잭션 제거
         return new_block
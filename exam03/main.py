@@ -1,14 +1,22 @@
 #%% main.py
 from blockchain import Blockchain, BlockchainWithPoW, Transaction
+from keys import generate_keypair
 import time
 
 #%%
 if __name__ == "__main__":
     # 기본 블록체인 예제
     bc = Blockchain()
+    # 주소는 공개키, 트랜잭션은 보내는 사람의 개인키로 서명
+    alice_key, alice = generate_keypair()
+    bob_key, bob = generate_keypair()
+    charlie_key, charlie = generate_keypair()
+    dave_key, dave = generate_keypair()
     # 트랜잭션 추가
-    bc.add_transaction(Transaction("Alice", "Bob", 10))
-    bc.add_transaction(Transaction("Bob", "Charlie", 20))
+    bc.add_transaction(Transaction(alice, bob, 10).sign(alice_key))
+    bc.add_transaction(Transaction(bob, charlie, 20).sign(bob_key))
+    # 서명이 없거나 다른 사람의 키로 서명한 트랜잭션은 추가되지 않음
+    bc.add_transaction(Transaction(alice, dave, 30).sign(bob_key))
 
     # 대기중인 트랜잭션으로 블록 생성
     bc.create_block_from_pending()
@@ -24,13 +32,13 @@ if __name__ == "__main__":
 #%%
     # PoW 블록체인 예제
     pow_bc = BlockchainWithPoW(difficulty=3)
-    pow_bc.add_transaction(Transaction("Alice", "Bob", 5))
-    pow_bc.add_transaction(Transaction("Bob", "Charlie", 2))
+    pow_bc.add_transaction(Transaction(alice, bob, 5).sign(alice_key))
+    pow_bc.add_transaction(Transaction(bob, charlie, 2).sign(bob_key))
 
     # 블록을 채굴(miner: "Miner1")
     pow_bc.create_block_from_pending("Miner1")
 
-    pow_bc.add_transaction(Transaction("Charlie", "Dave", 1))
+    pow_bc.add_transaction(Transaction(charlie, dave, 1).sign(charlie_key))
     pow_bc.create_block_from_pending("Miner1")
 
     # 블록체인 출력
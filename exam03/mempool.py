@@ -0,0 +1,92 @@
+# mempool.py
+# 아직 블록에 담기지 않은 트랜잭션 풀
+#  - tx-id 인덱스로 O(1) 중복 제거
+#  - 수수료(fee)가 높은 순서의 힙으로 블록에 담을 트랜잭션 선택
+#  - 크기 제한을 넘으면 수수료가 가장 낮은 트랜잭션부터 제거
+# 힙에서 직접 지우지 않고(lazy deletion) 인덱스에 없는 항목은 꺼낼 때 건너뜀
+import heapq
+
+
+class Mempool:
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.txs = {}  # tx_id -> (seq, tx)
+        self.best = []  # (-fee, seq, tx_id): 수수료 높은 것, 먼저 들어온 것 우선
+        self.worst = []  # (fee, -seq, tx_id): 수수료 낮은 것, 나중에 들어온 것 우선
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.txs)
+
+    def __contains__(self, tx_id):
+        return tx_id in self.txs
+
+    def __iter__(self):
+        # 들어온 순서대로
+        for _, tx in sorted(self.txs.values(), key=lambda entry: entry[0]):
+            yield tx
+
+    def get(self, tx_id):
+        entry = self.txs.get(tx_id)
+        return entry[1] if entry else None
+
+    def _is_live(self, seq, tx_id):
+        entry = self.txs.get(tx_id)
+        return entry is not None and entry[0] == seq
+
+    def _lowest(self):
+        while self.worst:
+            fee, neg_seq, tx_id = self.worst[0]
+            if self._is_live(-neg_seq, tx_id):
+                return fee, tx_id
+            heapq.heappop(self.worst)
+        return None
+
+    def add(self, tx):
+        tx_id = tx.calculate_hash()
+        if tx_id in self.txs:
+            return False
+        if len(self.txs) >= self.max_size:
+            # 가득 찼으면 가장 낮은 수수료보다 높은 경우에만 자리를 바꿈
+            fee, lowest_id = self._lowest()
+            if tx.fee <= fee:
+                return False
+            del self.txs[lowest_id]
+        self.seq += 1
+        self.txs[tx_id] = (self.seq, tx)
+        heapq.heappush(self.best, (-tx.fee, self.seq, tx_id))
+        heapq.heappush(self.worst, (tx.fee, -self.seq, tx_id))
+        self._compact()
+        return True
+
+    def remove(self, tx_ids):
+        for tx_id in tx_ids:
+            self.txs.pop(tx_id, None)
+        self._compact()
+
+    def remove_block(self, block):
+        # 블록에 포함된 트랜잭션을 풀에서 제거
+        self.remove(tx.calculate_hash() for tx in block.transactions)
+
+    def select(self, k=None):
+        # 수수료 높은 순서로 최대 k개 (풀 전체를 복사하지 않고 힙에서 k개만 꺼냄)
+        if k is None:
+            k = len(self.txs)
+        popped = []
+        selected = []
+        while self.best and len(selected) < k:
+            item = heapq.heappop(self.best)
+            if self._is_live(item[1], item[2]):
+                popped.append(item)
+                selected.append(self.txs[item[2]][1])
+        for item in popped:
+            heapq.heappush(self.best, item)
+        return selected
+
+    def _compact(self):
+        # 지워진 항목이 너무 많이 쌓이면 힙을 다시 만듦
+        if len(self.best) > 2 * len(self.txs) + 64:
+            self.best = [(-tx.fee, seq, tx_id) for tx_id, (seq, tx) in self.txs.items()]
+            self.worst = [(tx.fee, -seq, tx_id) for tx_id, (seq, tx) in self.txs.items()]
+            heapq.heapify(self.best)
+            heapq.heapify(self.worst)
@@ -0,0 +1,267 @@
+# bench.py
+# 해시 계산, 채굴, 체인 검증, 직렬화, 네트워크 브로드캐스트 성능 측정
+# 결과는 JSON으로 출력하므로 커밋끼리 비교할 수 있음
+# 사용법: python bench.py [--quick] [--only 이름 ...] [-o 결과.json]
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import time
+from blockchain import (BlockWithProof, BlockchainWithPoW, Transaction,
+                        block_to_dict, block_from_dict)
+from codec import encode_block, decode_block
+from keys import generate_keypair
+from node import Node
+from verifier import SignatureVerifier
+
+PRIVATE_KEY, ADDRESS = generate_keypair()
+# 크기를 실제와 맞추기 위한 서명 값 (해시/직렬화 측정에서는 검증하지 않음)
+SAMPLE_SIGNATURE = Transaction(ADDRESS, ADDRESS, 1).sign(PRIVATE_KEY).signature
+
+
+def make_transactions(count, offset=0):
+    return [Transaction(f"addr{i % 100}", f"addr{(i * 7 + 1) % 100}", i % 50 + 1, i % 5, SAMPLE_SIGNATURE)
+            for i in range(offset, offset + count)]
+
+
+def make_block(tx_count, index=1):
+    block = BlockWithProof(index, 1700000000.0 + index, make_transactions(tx_count), "0" * 64, difficulty=1)
+    block.set_hash()
+    return block
+
+
+def timed(func, repeat):
+    # repeat번 실행한 평균 시간(초)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def build_chain(length, tx_per_block=10, difficulty=1):
+    # 채굴 보상을 받는 주소가 블록마다 같은 서명된 트랜잭션들을 다시 담음
+    # (서명을 블록마다 새로 만들지 않아도 되므로 체인을 빨리 만들 수 있음)
+    # 같은 트랜잭션을 다시 담은 블록은 멤풀과 add_block이 거부하므로 템플릿에 직접 넣고 바로 붙임
+    bc = BlockchainWithPoW(difficulty=difficulty)
+    txs = [Transaction(ADDRESS, f"addr{j}", 1, 0).sign(PRIVATE_KEY) for j in range(tx_per_block - 1)]
+    for i in range(1, length):
+        block = bc.create_block_template(ADDRESS)
+        if i > 1:
+            block.transactions = block.transactions + txs
+        block.mine_block()
+        bc.commit_mined_block(block)
+    return bc
+
+
+def bench_calculate_hash(quick):
+    # 머클 루트를 새로 계산하는 경우(cold)와 캐시된 경우(warm)
+    results = []
+    for size in [1, 10, 100, 1000] if quick else [1, 10, 100, 1000, 10000]:
+        block = make_block(size)
+        repeat = max(10, 20000 // size)
+
+        def cold():
+            block.transactions = block.transactions
+            block.calculate_hash()
+
+        results.append({
+            "transactions": size,
+            "cold_us": timed(cold, repeat) * 1e6,
+            "warm_us": timed(block.calculate_hash, repeat * 10) * 1e6,
+        })
+    return results
+
+
+def bench_mine_block(quick):
+    results = []
+    for difficulty in [1, 2, 3] if quick else [1, 2, 3, 4, 5]:
+        hashes = 0
+        elapsed = 0.0
+        rounds = 0
+        # 난이도가 낮으면 한 번에 끝나므로 시도 횟수가 충분해질 때까지 반복
+        while hashes < 16 ** difficulty * 4 and rounds < 50:
+            block = BlockWithProof(1, time.time(), make_transactions(10, rounds), "0" * 64, difficulty)
+            start = time.perf_counter()
+            block.mine_block()
+            elapsed += time.perf_counter() - start
+            hashes += block.nonce + 1
+            rounds += 1
+        results.append({
+            "difficulty": difficulty,
+            "blocks": rounds,
+            "hashes": hashes,
+            "hashes_per_sec": hashes / elapsed,
+            "sec_per_block": elapsed / rounds,
+        })
+    return results
+
+
+def bench_is_chain_valid(quick):
+    results = []
+    for length in [100, 1000] if quick else [100, 1000, 5000]:
+        bc = build_chain(length)
+
+        def full():
+            # 증분 검증이 건너뛰지 않도록 검증 높이를 초기화
+            bc.verified_height = 0
+            assert bc.is_chain_valid()
+
+        results.append({
+            "blocks": length,
+            "full_ms": timed(full, 3) * 1e3,
+            "incremental_us": timed(bc.is_chain_valid, 100) * 1e6,
+        })
+    return results
+
+
+def bench_serialization(quick):
+    results = []
+    for size in [10, 100, 1000] if quick else [10, 100, 1000, 10000]:
+        block = make_block(size)
+        repeat = max(5, 5000 // size)
+        text = json.dumps(block_to_dict(block))
+        data = encode_block(block)
+        assert block_from_dict(json.loads(text)).hash == block.hash
+        assert decode_block(data).hash == block.hash
+        results.append({
+            "transactions": size,
+            "json_bytes": len(text),
+            "json_encode_us": timed(lambda: json.dumps(block_to_dict(block)), repeat) * 1e6,
+            "json_decode_us": timed(lambda: block_from_dict(json.loads(text)), repeat) * 1e6,
+            "binary_bytes": len(data),
+            "binary_encode_us": timed(lambda: encode_block(block), repeat) * 1e6,
+            "binary_decode_us": timed(lambda: decode_block(data), repeat) * 1e6,
+        })
+    return results
+
+
+def bench_signatures(quick):
+    # 처음 보는 트랜잭션의 서명 검증과 캐시된 트랜잭션의 재검증
+    count = 50 if quick else 200
+    txs = [Transaction(ADDRESS, f"addr{i}", i + 1).sign(PRIVATE_KEY) for i in range(count)]
+    results = []
+    for workers in [1, 2] if quick else [1, 2, 4]:
+        verifier = SignatureVerifier(workers=workers)
+        start = time.perf_counter()
+        assert all(verifier.verify_many(txs))
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        assert all(verifier.verify_many(txs))
+        cached = time.perf_counter() - start
+        verifier.close()
+        results.append({
+            "workers": workers,
+            "transactions": count,
+            "verify_us_per_tx": cold / count * 1e6,
+            "cached_us_per_tx": cached / count * 1e6,
+            "verified_per_sec": count / cold,
+        })
+    return results
+
+
+async def _broadcast(peer_count, block_count, base_port):
+    # 한 노드가 미리 채굴해 둔 블록을 차례로 브로드캐스트하고
+    # 모든 피어의 체인에 붙을 때까지 걸린 시간을 측정
+    hub = Node(port=base_port, difficulty=1)
+    peers = [Node(port=base_port + 1 + i, difficulty=1) for i in range(peer_count)]
+    nodes = [hub] + peers
+    servers = [asyncio.create_task(n.start_server()) for n in nodes]
+    await asyncio.sleep(0.2)
+    for s in servers:
+        if s.done():
+            # 포트를 열지 못했으면 (이미 사용 중 등) 예외를 그대로 올림
+            s.result()
+    for p in peers:
+        # 같은 제네시스에서 시작하도록 맞춤
+        p.blockchain.replace_chain(hub.blockchain.chain[:1])
+        await p.connect_to_peer(hub.host, hub.port)
+    await asyncio.sleep(0.2)
+
+    blocks = []
+    for _ in range(block_count):
+        blocks.append(hub.blockchain.mine_pending_transactions("miner"))
+    target = block_count + 1
+
+    start = time.perf_counter()
+    for block in blocks:
+        await hub.broadcast_block(block)
+    while any(len(p.blockchain.chain) < target for p in peers):
+        if time.perf_counter() - start > 60:
+            break
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    delivered = sum(len(p.blockchain.chain) - 1 for p in peers)
+
+    for n in nodes:
+        await n.close()
+    for s in servers:
+        s.cancel()
+    await asyncio.gather(*servers, return_exceptions=True)
+    return elapsed, delivered
+
+
+def bench_broadcast(quick):
+    results = []
+    for peer_count in [1, 4] if quick else [1, 4, 8]:
+        block_count = 50 if quick else 200
+        # 노드들이 출력하는 로그는 측정에서 제외
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, delivered = asyncio.run(_broadcast(peer_count, block_count, 7100 + peer_count * 20))
+        results.append({
+            "peers": peer_count,
+            "blocks": block_count,
+            "delivered": delivered,
+            "elapsed_sec": elapsed,
+            "blocks_per_sec": delivered / elapsed,
+        })
+    return results
+
+
+BENCHMARKS = {
+    "calculate_hash": bench_calculate_hash,
+    "mine_block": bench_mine_block,
+    "is_chain_valid": bench_is_chain_valid,
+    "serialization": bench_serialization,
+    "signatures": bench_signatures,
+    "broadcast": bench_broadcast,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="blockchain benchmarks")
+    parser.add_argument("--quick", action="store_true", help="작은 입력으로 빠르게 실행")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="실행할 벤치마크")
+    parser.add_argument("-o", "--output", help="결과를 저장할 JSON 파일 (없으면 표준 출력)")
+    args = parser.parse_args()
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": {},
+    }
+    for name in args.only or BENCHMARKS:
+        report["results"][name] = BENCHMARKS[name](args.quick)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# bench_memory.py
+# 트랜잭션/블록 객체가 차지하는 메모리 측정
+#  - before: __dict__를 쓰고 해시를 hex 문자열로 보관하던 이전 방식
+#  - after: 현재 blockchain.py (__slots__, 32바이트 해시, 주소 intern)
+# 사용법: python bench_memory.py [트랜잭션 수] [블록당 트랜잭션 수] [계정 수]
+import sys
+import tracemalloc
+from blockchain import Block, Transaction
+
+
+class DictTransaction:
+    def __init__(self, sender, receiver, amount, fee=0):
+        self.sender = sender
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee
+
+
+class DictBlock:
+    def __init__(self, index, timestamp, transactions, previous_hash):
+        self.index = index
+        self.timestamp = timestamp
+        self._transactions = transactions
+        self._merkle_root = None
+        self.previous_hash = previous_hash
+        self.hash = None
+
+
+def fake_hash(i):
+    return f"{i:064x}"
+
+
+def build(tx_cls, block_cls, tx_count, per_block, accounts):
+    blocks = []
+    previous = "0"
+    for start in range(0, tx_count, per_block):
+        transactions = []
+        for i in range(start, min(start + per_block, tx_count)):
+            # 네트워크/디스크에서 디코딩한 것처럼 주소 문자열을 매번 새로 만듦
+            sender = "".join(["addr", str(i % accounts)])
+            receiver = "".join(["addr", str((i * 7 + 1) % accounts)])
+            transactions.append(tx_cls(sender, receiver, i % 100 + 1, i % 5))
+        block = block_cls(len(blocks), 1700000000.0 + len(blocks), transactions, previous)
+        block.hash = fake_hash(len(blocks) + 1)
+        block._merkle_root = fake_hash(len(blocks) + 10 ** 9)
+        blocks.append(block)
+        previous = block.hash
+    return blocks
+
+
+def measure(tx_cls, block_cls, tx_count, per_block, accounts):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    blocks = build(tx_cls, block_cls, tx_count, per_block, accounts)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del blocks
+    return used
+
+
+def main():
+    tx_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    per_block = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    accounts = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    old = measure(DictTransaction, DictBlock, tx_count, per_block, accounts)
+    new = measure(Transaction, Block, tx_count, per_block, accounts)
+    print(f"{tx_count} transactions, {per_block} per block, {accounts} accounts")
+    print(f"before: {old / tx_count:.1f} bytes/tx ({old / 2 ** 20:.1f} MiB)")
+    print(f"after:  {new / tx_count:.1f} bytes/tx ({new / 2 ** 20:.1f} MiB)")
+    print(f"saved:  {(1 - new / old) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,125 @@
 # blockchain.py
 import hashlib
+import math
+import os
+import secrets
+import sys
 import time
+from miner import parallel_mine, CHECK_INTERVAL
+from merkle import merkle_root, merkle_proof
+from mempool import Mempool
+from state import AccountState, SYSTEM_ADDRESS
+from keys import sign
+from verifier import SignatureVerifier
+from txindex import TransactionIndex
+from chainindex import ChainIndex
+
+# 작업 증명 목표값: 해시를 256비트 정수로 보았을 때 target보다 작아야 함
+# 난이도 d(hex 0의 개수)는 target = 2^(256 - 4d)와 같음
+MAX_TARGET = (1 << 256) - 1
+# 재조정 한 번에 바뀔 수 있는 최대 배율
+MAX_RETARGET_FACTOR = 4
+# 블록 타임스탬프 규칙: 최근 MEDIAN_TIME_SPAN개 블록 타임스탬프의 중앙값(median-time-past)보다 뒤이고,
+# 현재 시각보다 MAX_FUTURE_BLOCK_TIME초 넘게 앞서지 않아야 함
+# (미래 시각을 적어 재조정 구간을 늘려 목표값을 쉽게 만드는 것을 막음)
+MEDIAN_TIME_SPAN = 11
+MAX_FUTURE_BLOCK_TIME = 2 * 60 * 60
+
+
+def difficulty_to_target(difficulty):
+    if isinstance(difficulty, int):
+        return max(1, min(MAX_TARGET, 1 << (256 - 4 * difficulty)))
+    return max(1, min(MAX_TARGET, int((1 << 256) / 16 ** difficulty)))
+
+
+def target_to_difficulty(target):
+    return math.log((1 << 256) / target, 16)
+
+
+def retarget(target, actual_time, expected_time):
+    # 실제 걸린 시간에 비례해서 목표값 조정 (빨랐으면 작게 = 어렵게)
+    actual_time = min(max(actual_time, expected_time / MAX_RETARGET_FACTOR), expected_time * MAX_RETARGET_FACTOR)
+    # 정수 연산으로 계산해야 노드마다 결과가 같음 (시간은 마이크로초 단위로 반올림)
+    new_target = target * max(1, round(actual_time * 1e6)) // max(1, round(expected_time * 1e6))
+    return max(1, min(MAX_TARGET, new_target))
+
+
+def block_work(block):
+    # 블록 하나의 작업량 = 목표값 이하의 해시를 찾는 데 필요한 평균 시도 횟수 (제네시스는 0)
+    if isinstance(block, BlockWithProof):
+        return (1 << 256) // (block.target + 1)
+    return 0
+
+
+def _to_raw(value):
+    # 64자리 hex 해시는 32바이트로 보관 (그 외 "0", None 등은 그대로)
+    if isinstance(value, str) and len(value) == 64:
+        try:
+            raw = bytes.fromhex(value)
+        except ValueError:
+            return value
+        if raw.hex() == value:
+            return raw
+    return value
+
+
+def _to_hex(value):
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def _intern(address):
+    # 같은 주소 문자열은 하나의 객체를 공유
+    return sys.intern(address) if type(address) is str else address
+
 
 class Transaction:
-    def __init__(self, sender, receiver, amount):
-        self.sender = sender
-        self.receiver = receiver
+    # 트랜잭션이 매우 많이 메모리에 올라가므로 __dict__ 없이 __slots__ 사용
+    # 주소는 Ed25519 공개키 hex (keys.py), 보내는 사람의 개인키로 서명해야 함 (채굴 보상 제외)
+    __slots__ = ("sender", "receiver", "amount", "fee", "signature", "nonce")
+
+    def __init__(self, sender, receiver, amount, fee=0, signature=None, nonce=None):
+        self.sender = _intern(sender)
+        self.receiver = _intern(receiver)
         self.amount = amount
+        self.fee = fee  # 채굴자가 받는 수수료 (높을수록 먼저 블록에 담김)
+        self.signature = signature  # 서명 hex (tx-id에는 포함되지 않음)
+        # 같은 내용의 지불을 여러 번 보낼 수 있도록 tx-id를 구분하는 값 (서명 대상에 포함, 주지 않으면 무작위)
+        # 이미 체인에 있는 tx-id는 거부하므로 서명된 트랜잭션을 그대로 다시 보내면 재전송(replay)으로 걸림
+        # 0은 nonce가 없던 이전 트랜잭션 (tx-id가 바뀌지 않도록 인코딩에 넣지 않음)
+        self.nonce = secrets.randbits(63) if nonce is None else nonce
 
     def is_valid(self):
-        return self.amount > 0
+        # 금액은 양수, 수수료는 0 이상인 유한한 숫자 (bool이나 문자열은 거부)
+        for value in (self.amount, self.fee):
+            if type(value) not in (int, float) or not math.isfinite(value):
+                return False
+        if type(self.nonce) is not int or not 0 <= self.nonce < 1 << 64:
+            return False
+        return self.amount > 0 and self.fee >= 0
+
+    def signing_bytes(self):
+        # 서명과 tx-id의 대상이 되는 정규(canonical) 인코딩
+        # 주소는 길이를 앞에 붙이고 금액/수수료/nonce는 ':'로 나누어 경계가 모호하지 않게 함
+        data = f"{len(self.sender)}:{self.sender}{len(self.receiver)}:{self.receiver}{self.amount!r}:{self.fee!r}"
+        if self.nonce:
+            data += f":{self.nonce}"
+        return data.encode()
+
+    def calculate_hash(self):
+        return hashlib.sha256(self.signing_bytes()).hexdigest()
+
+    def sign(self, private_key):
+        self.signature = sign(private_key, self.signing_bytes())
+        return self
 
     def __repr__(self):
         return f"Transaction({self.sender} -> {self.receiver}, {self.amount})"
 
 
 class Block:
+    # 해시는 내부에 32바이트 bytes로 보관하고, hash/previous_hash/merkle_root 속성으로는 hex 문자열을 돌려줌
+    __slots__ = ("index", "timestamp", "_transactions", "_merkle_root", "_previous_hash", "_hash")
+
     def __init__(self, index, timestamp, transactions, previous_hash):
         self.index = index
         self.timestamp = timestamp
@@ -23,9 +127,51 @@ class Block:
         self.previous_hash = previous_hash
         self.hash = None
 
+    @property
+    def hash(self):
+        return _to_hex(self._hash)
+
+    @hash.setter
+    def hash(self, value):
+        self._hash = _to_raw(value)
+
+    @property
+    def previous_hash(self):
+        return _to_hex(self._previous_hash)
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self._previous_hash = _to_raw(value)
+
+    @property
+    def raw_hash(self):
+        return self._hash
+
+    @property
+    def transactions(self):
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, transactions):
+        # 트랜잭션이 바뀌면 캐시된 머클 루트를 무효화
+        # (리스트를 직접 수정하지 말고 새 리스트를 대입할 것)
+        self._transactions = transactions
+        self._merkle_root = None
+
+    @property
+    def merkle_root(self):
+        # 트랜잭션 해시들의 머클 루트 (한 번만 계산해서 캐시)
+        if self._merkle_root is None:
+            self._merkle_root = _to_raw(merkle_root([t.calculate_hash() for t in self._transactions]))
+        return _to_hex(self._merkle_root)
+
+    def merkle_proof(self, tx_index):
+        # tx_index번째 트랜잭션의 포함 증명 (merkle.verify_proof로 검증)
+        return merkle_proof([t.calculate_hash() for t in self._transactions], tx_index)
+
     def calculate_hash(self):
-        tx_str = "".join([f"{t.sender}{t.receiver}{t.amount}" for t in self.transactions])
-        block_string = f"{self.index}{self.timestamp}{tx_str}{self.previous_hash}"
+        # 헤더 해시는 트랜잭션 전체 대신 머클 루트를 사용
+        block_string = f"{self.index}{self.timestamp}{self.merkle_root}{self.previous_hash}"
         return hashlib.sha256(block_string.encode()).hexdigest()
 
     def set_hash(self):
@@ -33,31 +179,154 @@ class Block:
 
 
 class BlockWithProof(Block):
-    def __init__(self, index, timestamp, transactions, previous_hash, difficulty=3):
+    __slots__ = ("nonce", "target")
+
+    def __init__(self, index, timestamp, transactions, previous_hash, difficulty=3, target=None):
+        # target을 직접 주지 않으면 difficulty(hex 0의 개수)로부터 계산
         super().__init__(index, timestamp, transactions, previous_hash)
         self.nonce = 0
-        self.difficulty = difficulty
+        self.target = target if target is not None else difficulty_to_target(difficulty)
+
+    @property
+    def difficulty(self):
+        # 표시용 난이도 (hex 0의 개수 단위, 소수 가능)
+        return target_to_difficulty(self.target)
+
+    def meets_target(self):
+        # 해시가 target보다 작은지 (해시 값 자체의 작업 증명만 확인)
+        return isinstance(self._hash, bytes) and int.from_bytes(self._hash, "big") < self.target
+
+    def hash_prefix(self):
+        # nonce를 제외한 블록 문자열 (채굴 중에는 변하지 않음)
+        return f"{self.index}{self.timestamp}{self.merkle_root}{self.previous_hash}"
 
     def calculate_hash(self):
-        tx_str = "".join([f"{t.sender}{t.receiver}{t.amount}" for t in self.transactions])
-        block_string = f"{self.index}{self.timestamp}{tx_str}{self.previous_hash}{self.nonce}"
+        block_string = f"{self.hash_prefix()}{self.nonce}"
         return hashlib.sha256(block_string.encode()).hexdigest()
 
-    def mine_block(self):
-        prefix = "0" * self.difficulty
+    def mine_block(self, workers=1, stop=None):
+        # stop(Event)이 설정되면 채굴을 중단하고 False 반환
+        if workers > 1:
+            # 여러 프로세스로 nonce 공간을 나누어 탐색
+            result = parallel_mine(self.hash_prefix(), self.target, workers, stop)
+            if result is None:
+                return False
+            self.nonce, self.hash = result
+            return True
+        # 같은 길이의 bytes 비교는 빅엔디안 정수 비교와 같으므로 digest를 그대로 비교
+        target = self.target.to_bytes(32, "big")
+        # 고정된 앞부분을 미리 해시해 두고(midstate) nonce마다 복사해서 nonce만 추가
+        midstate = hashlib.sha256(self.hash_prefix().encode())
         while True:
-            hashed = self.calculate_hash()
-            if hashed.startswith(prefix):
-                self.hash = hashed
-                break
+            h = midstate.copy()
+            h.update(str(self.nonce).encode())
+            if h.digest() < target:
+                self.hash = h.hexdigest()
+                return True
             self.nonce += 1
+            if stop is not None and self.nonce % CHECK_INTERVAL == 0 and stop.is_set():
+                return False
+
+
+def transaction_to_dict(tx):
+    d = {"sender": tx.sender, "receiver": tx.receiver, "amount": tx.amount, "fee": tx.fee}
+    if tx.signature is not None:
+        d["signature"] = tx.signature
+    if tx.nonce:
+        d["nonce"] = tx.nonce
+    return d
+
+
+def transaction_from_dict(d):
+    return Transaction(d["sender"], d["receiver"], d["amount"], d.get("fee", 0), d.get("signature"), d.get("nonce") or 0)
+
+
+def block_to_dict(block):
+    d = {
+        "index": block.index,
+        "timestamp": block.timestamp,
+        "transactions": [transaction_to_dict(t) for t in block.transactions],
+        "previous_hash": block.previous_hash,
+        "hash": block.hash
+    }
+    if isinstance(block, BlockWithProof):
+        d["nonce"] = block.nonce
+        d["target"] = f"{block.target:064x}"
+    return d
+
+
+def block_from_dict(d):
+    transactions = [transaction_from_dict(t) for t in d["transactions"]]
+    if "nonce" in d:
+        # 예전 형식은 target 대신 difficulty만 있음
+        target = int(d["target"], 16) if "target" in d else None
+        block = BlockWithProof(d["index"], d["timestamp"], transactions, d["previous_hash"],
+                               difficulty=d.get("difficulty", 3), target=target)
+        block.nonce = d["nonce"]
+    else:
+        block = Block(d["index"], d["timestamp"], transactions, d["previous_hash"])
+    block.hash = d["hash"]
+    return block
+
+
+def header_to_dict(block):
+    # 트랜잭션 없이 헤더만 (블록 해시는 머클 루트로 검증 가능)
+    d = block_to_dict(block)
+    del d["transactions"]
+    d["merkle_root"] = block.merkle_root
+    return d
+
+
+def header_from_dict(d):
+    # 트랜잭션이 비어 있는 블록 객체에 머클 루트만 채워 넣어 헤더로 사용
+    block = block_from_dict(dict(d, transactions=[]))
+    block._merkle_root = _to_raw(d["merkle_root"])
+    return block
 
 
 class BlockchainWithPoW:
-    def __init__(self):
-        self.chain = [self.create_genesis_block()]
-        self.pending_transactions = []
+    def __init__(self, store=None, checkpoints=None, mempool_size=10000, max_block_transactions=1000,
+                 difficulty=3, block_interval=10.0, retarget_interval=None, max_side_blocks=1000,
+                 verifier=None):
+        # store: 디스크 블록 저장소 (storage.BlockStore). 없으면 메모리 리스트 사용
+        if store is None:
+            self.chain = [self.create_genesis_block()]
+        else:
+            self.chain = store
+            if len(store) == 0:
+                store.append(self.create_genesis_block())
+        # 아직 블록에 담지 않은 트랜잭션 (중복 제거, 수수료 우선순위, 크기 제한)
+        self.mempool = Mempool(mempool_size)
+        # 트랜잭션 서명 검증 (검증 결과 캐시를 멤풀과 블록 검증이 함께 씀)
+        self.verifier = verifier or SignatureVerifier()
+        self.max_block_transactions = max_block_transactions
         self.mining_reward = 50
+        # 작업 증명 목표값: 첫 블록은 difficulty로 시작하고 retarget_interval 블록마다
+        # 실제 블록 시간을 block_interval(초)에 맞추도록 재조정 (None이면 고정)
+        # 모든 노드가 같은 값을 써야 함
+        self.initial_target = difficulty_to_target(difficulty)
+        self.block_interval = block_interval
+        self.retarget_interval = retarget_interval
+        # 이미 검증이 끝난 가장 높은 블록 높이 (제네시스는 검증 대상 아님)
+        self.verified_height = 0
+        # 신뢰하는 체크포인트 {높이: 해시} - 이 높이 이하의 이력은 검증을 건너뜀
+        self.checkpoints = dict(checkpoints or {})
+        # 블록 트리: 활성 체인의 블록은 해시 -> 높이, 곁가지(side branch) 블록은 해시 -> 블록
+        # 모든 블록의 누적 작업량(제네시스부터의 합)을 해시별로 기록하고 가장 큰 팁을 활성 체인으로 삼음
+        self.heights = {}
+        self.work = {}
+        self.side_blocks = {}
+        self.max_side_blocks = max_side_blocks
+        # 디스크 저장소를 다시 열 때 블록을 디코딩하지 않도록 활성 체인의 해시/누적 작업량과
+        # 잔액 스냅숏을 저장소 디렉터리에 함께 기록
+        self.chain_index = ChainIndex(store.path) if store is not None else None
+        self._index_chain()
+        # tx-id/주소별 트랜잭션 위치 인덱스 (디스크 저장소가 있으면 그 디렉터리에 함께 기록)
+        self.tx_index = TransactionIndex(os.path.join(store.path, "txindex.dat") if store is not None else None)
+        self.tx_index.sync(self.chain)
+        # 계정 잔액 인덱스 (디스크 저장소를 다시 연 경우 스냅숏 이후만 다시 반영)
+        self.state = AccountState()
+        self._load_state()
 
     def create_genesis_block(self):
         genesis_block = Block(0, time.time(), [], "0")
@@ -67,40 +336,472 @@ class BlockchainWithPoW:
     def get_latest_block(self):
         return self.chain[-1]
 
-    def is_chain_valid(self):
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            prev_block = self.chain[i-1]
-            if current_block.hash != current_block.calculate_hash():
+    def _index_chain(self):
+        entries = self.chain_index.entries() if self.chain_index is not None else []
+        # 저장된 인덱스가 체인보다 길거나 마지막 해시가 다르면 (기록 사이에 종료) 처음부터 다시 만듦
+        if len(entries) > len(self.chain) or (entries and self.chain[len(entries) - 1].hash != entries[-1][0]):
+            entries = []
+            self.chain_index.truncate(0)
+        total = 0
+        for height, (block_hash, total) in enumerate(entries):
+            self.heights[block_hash] = height
+            self.work[block_hash] = total
+        # 인덱스에 없는 블록만 디코딩
+        for height in range(len(entries), len(self.chain)):
+            block = self.chain[height]
+            total += block_work(block)
+            self.heights[block.hash] = height
+            self.work[block.hash] = total
+            if self.chain_index is not None:
+                self.chain_index.append(block.hash, total)
+
+    def _load_state(self):
+        # 스냅숏의 블록이 활성 체인에 있으면 그 다음 블록부터만 반영
+        height = 0
+        snapshot = self.chain_index.load_state() if self.chain_index is not None else None
+        if snapshot is not None:
+            snapshot_height, block_hash, balances = snapshot
+            if self.heights.get(block_hash) == snapshot_height:
+                self.state.balances = balances
+                self.state.height = height = snapshot_height
+        for i in range(height + 1, len(self.chain)):
+            self.state.apply_block(self.chain[i])
+
+    def tip_work(self):
+        return self.work[self.get_latest_block().hash]
+
+    def chain_work(self, blocks):
+        return sum(block_work(b) for b in blocks)
+
+    def get_block_by_hash(self, block_hash):
+        # 활성 체인에 있는 블록만 (없으면 None)
+        height = self.heights.get(block_hash)
+        return None if height is None else self.chain[height]
+
+    def get_transaction(self, tx_id):
+        # 활성 체인에 담긴 트랜잭션: (높이, 블록 안 위치, 트랜잭션) 또는 None
+        location = self.tx_index.find(tx_id)
+        if location is None:
+            return None
+        height, position = location
+        return height, position, self.chain[height].transactions[position]
+
+    def get_address_history(self, address, limit=None):
+        # 주소가 보내거나 받은 트랜잭션 [(높이, 위치, 트랜잭션)] (높이 순, limit이면 가장 최근 limit개)
+        return [(height, position, self.chain[height].transactions[position])
+                for height, position in self.tx_index.address_history(address, limit)]
+
+    def get_block(self, block_hash):
+        # 활성 체인이나 곁가지에 있는 블록 (없으면 None)
+        height = self.heights.get(block_hash)
+        if height is not None:
+            return self.chain[height]
+        return self.side_blocks.get(block_hash)
+
+    def _add_side(self, block):
+        self.side_blocks[block.hash] = block
+        if len(self.side_blocks) > self.max_side_blocks:
+            # 가장 낮은 곁가지 블록부터 버림
+            oldest = min(self.side_blocks.values(), key=lambda b: b.index)
+            del self.side_blocks[oldest.hash]
+            self.work.pop(oldest.hash, None)
+
+    def _ancestor(self, block, height):
+        # block이 속한 가지에서 height 높이의 조상 (활성 체인에 닿으면 체인에서 바로 찾음)
+        while block is not None and block.index > height:
+            if block.hash in self.heights:
+                return self.chain[height]
+            block = self.get_block(block.previous_hash)
+        return block
+
+    def add_checkpoint(self, height, block_hash):
+        self.checkpoints[height] = block_hash
+
+    def next_target(self, prev_block, first_block=None):
+        # prev_block 다음 블록이 가져야 할 목표값
+        # first_block: 재조정 구간의 첫 블록 (높이 = 다음 높이 - retarget_interval)
+        #              주지 않으면 현재 체인에서 찾음
+        if not isinstance(prev_block, BlockWithProof):
+            return self.initial_target
+        height = prev_block.index + 1
+        if not self.retarget_interval or height % self.retarget_interval != 0:
+            return prev_block.target
+        if first_block is None:
+            first_block = self.chain[height - self.retarget_interval]
+        # 구간의 블록 retarget_interval개 사이 간격은 retarget_interval - 1개
+        expected = (self.retarget_interval - 1) * self.block_interval
+        return retarget(prev_block.target, prev_block.timestamp - first_block.timestamp, expected)
+
+    def is_target_valid(self, block, prev_block, first_block=None):
+        return block.target == self.next_target(prev_block, first_block)
+
+    def is_orphan_target_plausible(self, block):
+        # 부모를 모르는 블록은 목표값이 맞는지 확인할 수 없으므로, 적어도 현재 팁 다음 목표값보다
+        # 재조정 한 번(MAX_RETARGET_FACTOR배)을 넘게 쉬운 목표값은 거부
+        # (아무 목표값이나 적을 수 있으면 작업 없이 고아 블록을 만들어 보낼 수 있음)
+        if not isinstance(block, BlockWithProof):
+            return False
+        return block.target <= self.next_target(self.get_latest_block()) * MAX_RETARGET_FACTOR
+
+    def recent_timestamps(self, prev_block):
+        # prev_block부터 거슬러 올라간 최근 MEDIAN_TIME_SPAN개 블록의 타임스탬프 (prev_block이 속한 가지 기준)
+        timestamps = []
+        block = prev_block
+        while block is not None and len(timestamps) < MEDIAN_TIME_SPAN:
+            timestamps.append(block.timestamp)
+            block = self.get_block(block.previous_hash) if block.index > 0 else None
+        return timestamps
+
+    def median_time_past(self, timestamps):
+        timestamps = sorted(timestamps)
+        return timestamps[len(timestamps) // 2]
+
+    def is_timestamp_valid(self, block, timestamps):
+        # timestamps: 바로 앞 블록들의 타임스탬프 (최대 MEDIAN_TIME_SPAN개)
+        if block.timestamp <= self.median_time_past(timestamps):
+            return False
+        return block.timestamp <= time.time() + MAX_FUTURE_BLOCK_TIME
+
+    def is_header_valid(self, block, prev_block, first_block=None, timestamps=None):
+        # 본문 없이 확인할 수 있는 것만 (헤더 우선 동기화는 본문을 받기 전에 헤더만으로 검증)
+        # timestamps: 바로 앞 블록들의 타임스탬프, 주지 않으면 prev_block이 속한 가지에서 찾음
+        #             (아직 블록 트리에 없는 헤더를 이어서 검증할 때는 호출하는 쪽이 넘겨야 함)
+        if block.hash != block.calculate_hash():
+            return False
+        if block.previous_hash != prev_block.hash:
+            return False
+        if timestamps is None:
+            timestamps = self.recent_timestamps(prev_block)
+        if not self.is_timestamp_valid(block, timestamps):
+            return False
+        # 작업 증명 확인: 해시가 목표값보다 작고, 목표값이 체인에서 정해진 값과 같아야 함
+        if isinstance(block, BlockWithProof):
+            if not block.meets_target() or not self.is_target_valid(block, prev_block, first_block):
                 return False
-            if current_block.previous_hash != prev_block.hash:
+        if block.index in self.checkpoints and self.checkpoints[block.index] != block.hash:
+            return False
+        return True
+
+    def is_block_valid(self, block, prev_block, first_block=None):
+        return self.is_header_valid(block, prev_block, first_block) and self.are_transactions_valid(block)
+
+    def are_transactions_valid(self, block):
+        # 머클 트리는 홀수 개 레벨의 마지막 해시를 복제하므로 [.., t2]와 [.., t2, t2]의 루트(=블록 해시)가 같음
+        # 같은 tx-id가 두 번 들어 있는 블록은 거부해서 같은 해시로 내용만 다른 블록을 만들 수 없게 함
+        tx_ids = [tx.calculate_hash() for tx in block.transactions]
+        if len(set(tx_ids)) != len(tx_ids):
+            return False
+        # 보상 트랜잭션은 맨 앞에 정확히 하나, 금액은 mining_reward (수수료는 잔액 상태에서 따로 지급)
+        # 보낸 사람이 SYSTEM_ADDRESS인 트랜잭션은 서명 없이 잔액을 만들어 내므로 다른 자리에는 올 수 없음
+        transactions = block.transactions
+        if not transactions or transactions[0].sender != SYSTEM_ADDRESS:
+            return False
+        if transactions[0].amount != self.mining_reward:
+            return False
+        return all(tx.sender != SYSTEM_ADDRESS for tx in transactions[1:])
+
+    def validate_range(self, start, end):
+        # start 이상 end 미만 높이의 블록을 검증 (각 블록은 바로 앞 블록과의 연결까지 확인)
+        start = max(start, 1)
+        end = min(end, len(self.chain))
+        if start >= end:
+            return True
+        prev_block = self.chain[start - 1]
+        for i in range(start, end):
+            current_block = self.chain[i]
+            if not self.is_block_valid(current_block, prev_block):
                 return False
+            prev_block = current_block
+        return True
+
+    def is_chain_valid(self):
+        # 이미 검증한 높이 이후의 새 블록만 검증
+        start = min(self.verified_height, len(self.chain) - 1) + 1
+        # 체인에 일치하는 신뢰 체크포인트가 있으면 그 이전 이력은 건너뜀
+        for height, block_hash in self.checkpoints.items():
+            if start <= height < len(self.chain) and self.chain[height].hash == block_hash:
+                start = height + 1
+        if not self.validate_range(start, len(self.chain)):
+            return False
+        self.verified_height = len(self.chain) - 1
         return True
 
+    def _rebuild_state(self, height):
+        # 제네시스부터 height까지 다시 반영 (되돌리기 기록이 부족할 때 사용)
+        self.state.reset()
+        for i in range(1, height + 1):
+            self.state.apply_block(self.chain[i])
+
+    def get_balance(self, address):
+        return self.state.get_balance(address)
+
     def add_transaction(self, transaction):
-        if transaction.is_valid():
-            self.pending_transactions.append(transaction)
+        if not transaction.is_valid() or transaction.sender == SYSTEM_ADDRESS:
+            return False
+        # 이미 활성 체인에 담긴 트랜잭션을 다시 보낸 것(replay)이면 거부
+        if self.tx_index.find(transaction.calculate_hash()) is not None:
+            return False
+        # 잔액에서 이미 풀에 묶인 금액을 빼고도 보낼 수 있어야 함
+        available = self.state.get_balance(transaction.sender) - self.mempool.pending_spend(transaction.sender)
+        if available < transaction.amount + transaction.fee:
+            return False
+        # 서명 검증은 가장 비싸므로 마지막에
+        if not self.verifier.verify(transaction):
+            return False
+        return self.mempool.add(transaction)
+
+    def add_transactions(self, transactions):
+        # 여러 트랜잭션을 한 번에 검증/추가하고 추가된 트랜잭션 목록을 반환
+        # 서명은 먼저 한꺼번에 배치로 검증 (통과한 것은 캐시되므로 add_transaction에서 다시 검증하지 않음)
+        transactions = [tx for tx in transactions if tx.sender != SYSTEM_ADDRESS and tx.calculate_hash() not in self.mempool
+                        and self.tx_index.find(tx.calculate_hash()) is None]
+        signed = self.verifier.verify_many(transactions)
+        added = []
+        for tx, ok in zip(transactions, signed):
+            if ok and self.add_transaction(tx):
+                added.append(tx)
+        return added
+
+    def add_block(self, block):
+        # 블록을 previous_hash가 가리키는 부모 아래에 붙임
+        #  - 부모가 팁이면 활성 체인에 추가
+        #  - 부모가 다른 곳이면 곁가지로 보관하고, 그 가지의 누적 작업량이 더 커지면 재구성
+        # 부모를 모르거나 검증에 실패하면 False
+        if not isinstance(block, BlockWithProof):
+            block.set_hash()
+        # 블록이 이미 채굴되어 해시가 세팅되어 있어야 함
+        if not block.hash or block.hash in self.work:
+            return False
+        parent = self.get_block(block.previous_hash)
+        if parent is None or block.index != parent.index + 1:
+            return False
+        first = None
+        if self.retarget_interval and block.index >= self.retarget_interval:
+            first = self._ancestor(parent, block.index - self.retarget_interval)
+        if not self.is_block_valid(block, parent, first):
+            return False
+        if not self.verifier.verify_all(block.transactions):
+            return False
+
+        if parent.hash == self.get_latest_block().hash:
+            # 이미 체인에 담긴 트랜잭션이 있거나 잔액이 모자란 트랜잭션이 있으면 거부
+            if self._has_replayed_transactions(len(self.chain), [block]):
+                return False
+            if not self.state.apply_block(block):
+                return False
+            self._append_verified(block)
+            self.mempool.remove_block(block)
             return True
+
+        work = self.work[parent.hash] + block_work(block)
+        self.work[block.hash] = work
+        self._add_side(block)
+        if work <= self.tip_work():
+            return True
+        # 분기 지점(활성 체인에 있는 조상)까지 거슬러 올라가 다른 부분만 교체
+        branch = [block]
+        while branch[-1].previous_hash not in self.heights:
+            ancestor = self.side_blocks.get(branch[-1].previous_hash)
+            if ancestor is None:
+                return True
+            branch.append(ancestor)
+        branch.reverse()
+        if not self.reorganize(branch[0].index, branch):
+            # 잔액이 맞지 않는 가지는 버림
+            for b in branch:
+                self.side_blocks.pop(b.hash, None)
+                self.work.pop(b.hash, None)
+            return False
+        return True
+
+    def _has_replayed_transactions(self, fork, blocks):
+        # fork 미만 높이의 활성 체인이나 blocks 안에 이미 담긴 트랜잭션이 있으면 True
+        # (tx-id에 nonce가 들어가므로 같은 지불을 새로 보낸 것은 tx-id가 달라 통과)
+        # 보상 트랜잭션은 서명이 없고 nonce가 없던 이전 보상은 tx-id가 겹칠 수 있으므로 제외
+        seen = set()
+        for block in blocks:
+            for tx in block.transactions:
+                if tx.sender == SYSTEM_ADDRESS:
+                    continue
+                tx_id = tx.calculate_hash()
+                location = self.tx_index.find(tx_id)
+                if tx_id in seen or (location is not None and location[0] < fork):
+                    return True
+                seen.add(tx_id)
         return False
 
-    def add_block(self, block):
-        # 블록 체인에 추가 시 검증
-        block.previous_hash = self.get_latest_block().hash
-        if isinstance(block, BlockWithProof):
-            # 블록이 이미 채굴되어 해시가 세팅되어 있어야 함
-            # 여기서는 단순 검사만
-            if not block.hash or block.hash != block.calculate_hash():
+    def _append_verified(self, block):
+        # 검증된 팁 위에 검증된 블록을 붙이면 검증 높이도 함께 올림
+        if self.verified_height == len(self.chain) - 1:
+            self.verified_height += 1
+        self.work[block.hash] = self.tip_work() + block_work(block)
+        self.heights[block.hash] = len(self.chain)
+        self.side_blocks.pop(block.hash, None)
+        self.chain.append(block)
+        self.tx_index.apply_block(block)
+        if self.chain_index is not None:
+            self.chain_index.append(block.hash, self.work[block.hash])
+            if block.index % self.chain_index.snapshot_interval == 0:
+                self.chain_index.save_state(self.state, block.hash)
+
+    def locator(self):
+        # 공통 조상을 찾기 위한 블록 해시 목록: 팁에서부터 1, 2, 4, 8 ... 간격, 마지막은 제네시스
+        heights = []
+        height, step = len(self.chain) - 1, 1
+        while height > 0:
+            heights.append(height)
+            if len(heights) >= 10:
+                step *= 2
+            height -= step
+        heights.append(0)
+        return [self.chain[h].hash for h in heights]
+
+    def find_locator(self, locator):
+        # 로케이터에서 내 체인에 있는 첫 번째 해시의 높이 (없으면 -1)
+        for block_hash in locator:
+            height = self.height_of(block_hash)
+            if height is not None:
+                return height
+        return -1
+
+    def height_of(self, block_hash):
+        return self.heights.get(block_hash)
+
+    def replace_chain(self, blocks):
+        # 체인 교체: 공통 조상(분기 지점) 이후만 바꿈
+        blocks = list(blocks)
+        fork = 0
+        while fork < min(len(blocks), len(self.chain)) and blocks[fork].hash == self.chain[fork].hash:
+            fork += 1
+        return self.replace_from(fork, blocks[fork:])
+
+    def replace_from(self, fork, blocks):
+        # fork 높이부터를 blocks로 교체 (fork 미만은 현재 체인을 그대로 씀)
+        # 받은 체인을 끝까지 모으지 않고 공통 조상 이후만 넘길 때 사용
+        if not 0 <= fork <= len(self.chain):
+            return False
+        # 바꿀 블록의 높이(index)가 체인 안의 위치와 같아야 함
+        if any(block.index != height for height, block in enumerate(blocks, fork)):
+            return False
+
+        def at(height):
+            return blocks[height - fork] if height >= fork else self.chain[height]
+
+        # 새 블록의 타임스탬프와 목표값이 새 체인의 이력으로 계산한 값에 맞는지 확인
+        n = self.retarget_interval
+        for height in range(max(fork, 1), fork + len(blocks)):
+            block = at(height)
+            recent = [at(h).timestamp for h in range(max(height - MEDIAN_TIME_SPAN, 0), height)]
+            if not self.is_timestamp_valid(block, recent):
                 return False
+            if isinstance(block, BlockWithProof):
+                first = at(height - n) if n and height >= n else None
+                if not self.is_target_valid(block, at(height - 1), first):
+                    return False
+        return self.reorganize(fork, blocks)
+
+    def reorganize(self, fork, blocks):
+        # fork 높이부터를 blocks로 교체 (fork 미만은 그대로 유지)
+        # 잔액 상태도 분기 지점까지만 되돌린 뒤 새 블록을 반영
+        # 서명은 한꺼번에 검증 (이미 검증한 트랜잭션은 캐시에서 바로 통과)
+        # blocks는 fork 높이부터 빈틈없이 이어져야 함 (높이가 잔액 상태와 인덱스의 위치로 쓰임)
+        if fork > len(self.chain):
+            return False
+        prev = self.chain[fork - 1] if fork > 0 else None
+        for height, block in enumerate(blocks, fork):
+            if block.index != height or (prev is not None and block.previous_hash != prev.hash):
+                return False
+            prev = block
+        if not all(self.are_transactions_valid(block) for block in blocks if block.index > 0):
+            return False
+        if self._has_replayed_transactions(fork, blocks):
+            return False
+        if not self.verifier.verify_all([tx for block in blocks for tx in block.transactions]):
+            return False
+        if fork == 0:
+            # 제네시스부터 다름
+            self.state.reset()
+        elif self.state.can_rollback(fork - 1):
+            self.state.rollback(fork - 1)
         else:
-            block.set_hash()
+            self._rebuild_state(fork - 1)
+        for block in blocks:
+            if block.index > 0 and not self.state.apply_block(block):
+                # 새 체인에 잔액이 모자란 트랜잭션이 있으면 원래 상태로 복구
+                self._rebuild_state(len(self.chain) - 1)
+                return False
 
-        self.chain.append(block)
+        self.verified_height = min(self.verified_height, max(fork - 1, 0))
+        for block in blocks:
+            self.mempool.remove_block(block)
+        # 밀려난 블록은 곁가지로 (최근 max_side_blocks개까지), 새 블록은 활성 체인 인덱스로
+        old_len = len(self.chain)
+        for height in range(old_len - 1, fork - 1, -1):
+            self.tx_index.undo_block(self.chain[height])
+        displaced = []
+        for height in range(fork, old_len):
+            old = self.chain[height]
+            displaced.append(old)
+            del self.heights[old.hash]
+            if old_len - height <= self.max_side_blocks:
+                self._add_side(old)
+            else:
+                self.work.pop(old.hash, None)
+        total = self.work[self.chain[fork - 1].hash] if fork > 0 else 0
+        for height, block in enumerate(blocks, fork):
+            total += block_work(block)
+            self.work[block.hash] = total
+            self.heights[block.hash] = height
+            self.side_blocks.pop(block.hash, None)
+        if isinstance(self.chain, list):
+            self.chain = self.chain[:fork] + list(blocks)
+        else:
+            self.chain.truncate(fork)
+            for block in blocks:
+                self.chain.append(block)
+        for block in blocks:
+            self.tx_index.apply_block(block)
+        if self.chain_index is not None:
+            self.chain_index.truncate(fork)
+            for block in blocks:
+                self.chain_index.append(block.hash, self.work[block.hash])
+            # 이전 스냅숏은 밀려난 블록 기준일 수 있으므로 새 팁 기준으로 다시 기록
+            self.chain_index.save_state(self.state, self.get_latest_block().hash)
+        # 밀려난 블록에만 담겨 있던 트랜잭션은 다시 풀로 (원래 순서대로, 새 잔액 기준)
+        # 새 가지에도 담긴 트랜잭션은 tx 인덱스에 있으므로 add_transactions가 건너뜀
+        self.add_transactions([tx for block in displaced for tx in block.transactions])
         return True
 
-    def mine_pending_transactions(self, miner_address, difficulty=3):
-        block = BlockWithProof(len(self.chain), time.time(), self.pending_transactions[:], self.get_latest_block().hash, difficulty)
-        block.mine_block()
-        self.chain.append(block)
-        # 보상 트랜잭션
-        self.pending_transactions = [Transaction("System", miner_address, self.mining_reward)]
+    def create_block_template(self, miner_address):
+        # 현재 팁 위에 채굴 전 블록 생성
+        # 보상 트랜잭션을 맨 앞에 두고, 수수료가 높은 트랜잭션부터 최대 max_block_transactions개
+        # 선택한 트랜잭션 중 현재 잔액으로 보낼 수 없는 것은 제외
+        reward_tx = Transaction(SYSTEM_ADDRESS, miner_address, self.mining_reward)
+        transactions = [reward_tx]
+        spent = {}
+        for tx in self.mempool.select(self.max_block_transactions):
+            need = spent.get(tx.sender, 0) + tx.amount + tx.fee
+            if self.state.get_balance(tx.sender) >= need:
+                spent[tx.sender] = need
+                transactions.append(tx)
+        tip = self.get_latest_block()
+        # 시계가 늦어도 median-time-past보다는 뒤의 시각을 적음
+        timestamp = max(time.time(), self.median_time_past(self.recent_timestamps(tip)) + 0.001)
+        return BlockWithProof(len(self.chain), timestamp, transactions, tip.hash, target=self.next_target(tip))
+
+    def commit_mined_block(self, block):
+        # 채굴하는 동안 다른 블록이 먼저 붙었으면 이 블록은 버림
+        if block.previous_hash != self.get_latest_block().hash:
+            return False
+        if not self.state.apply_block(block):
+            return False
+        self._append_verified(block)
+        # 블록에 담긴 트랜잭션만 풀에서 제거 (채굴 중에 들어온 트랜잭션은 남음)
+        self.mempool.remove_block(block)
+        return True
+
+    def mine_pending_transactions(self, miner_address, workers=1):
+        block = self.create_block_template(miner_address)
+        block.mine_block(workers)
+        self.commit_mined_block(block)
         return block
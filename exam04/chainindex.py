@@ -0,0 +1,59 @@
+# chainindex.py
+# 블록 저장소를 다시 열 때 블록을 디코딩하지 않도록 저장해 두는 인덱스
+#  - hashes.dat : 높이 -> (블록 해시, 제네시스부터의 누적 작업량) 고정 폭 레코드
+#  - state.json : snapshot_interval 블록마다 기록하는 잔액 스냅숏 (높이, 블록 해시, 잔액)
+# 다시 열면 hashes.dat를 그대로 읽고, 잔액은 스냅숏 이후의 블록만 다시 반영
+import json
+import os
+import struct
+
+ENTRY = struct.Struct(">32s40s")  # 블록 해시, 누적 작업량 (320비트)
+
+
+class ChainIndex:
+    def __init__(self, path, snapshot_interval=100):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.file = open(os.path.join(path, "hashes.dat"), "a+b")
+        # 기록 도중 끊긴 마지막 레코드는 버림
+        size = os.path.getsize(self.file.name)
+        self.length = size // ENTRY.size
+        if size != self.length * ENTRY.size:
+            self.file.truncate(self.length * ENTRY.size)
+
+    def entries(self):
+        # [(블록 해시 hex, 누적 작업량)] (높이 순)
+        self.file.seek(0)
+        data = self.file.read(self.length * ENTRY.size)
+        return [(block_hash.hex(), int.from_bytes(work, "big"))
+                for block_hash, work in ENTRY.iter_unpack(data)]
+
+    def append(self, block_hash, work):
+        self.file.write(ENTRY.pack(bytes.fromhex(block_hash), work.to_bytes(40, "big")))
+        self.file.flush()
+        self.length += 1
+
+    def truncate(self, height):
+        # height 이후의 레코드를 모두 삭제
+        if height < self.length:
+            self.length = height
+            self.file.truncate(height * ENTRY.size)
+
+    def save_state(self, state, block_hash):
+        # 임시 파일에 쓴 뒤 바꿔치기 (쓰는 도중 종료되어도 이전 스냅숏이 남음)
+        path = os.path.join(self.path, "state.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump({"height": state.height, "hash": block_hash, "balances": state.balances}, f)
+        os.replace(path + ".tmp", path)
+
+    def load_state(self):
+        # (높이, 블록 해시, 잔액) 또는 None
+        try:
+            with open(os.path.join(self.path, "state.json")) as f:
+                d = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return d["height"], d["hash"], d["balances"]
+
+    def close(self):
+        self.file.close()
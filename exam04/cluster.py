@@ -0,0 +1,330 @@
+# cluster.py
+# 루프백 주소에서 여러 노드를 띄우고 부하를 걸어 네트워크 전체의 동작을 측정
+#  - 노드 N개를 한 프로세스 또는 여러 프로세스에 나누어 실행하고, 지정한 토폴로지로 연결
+#  - 모든 노드가 같은 시드 체인(제네시스 + 부하용 계정마다 채굴 보상 블록 하나)에서 시작
+#  - 서명된 트랜잭션을 목표 속도로 노드들에 골고루 넣고, 일부 노드는 계속 채굴
+#  - 끝나면 확정된 트랜잭션 처리량, 블록 전파 시간 백분위수, 곁가지/고아 블록 수를 JSON으로 출력
+# 사용법: python cluster.py [--nodes N] [--processes P] [--topology ring] [--tps 5] [--duration 30] [-o 결과.json]
+# 한 프로세스에서는 채굴 스레드와 노드들이 GIL을 나눠 쓰므로 노드가 많으면 --processes를 늘릴 것
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import random
+import time
+from blockchain import BlockchainWithPoW, Transaction
+from codec import encode_chain, iter_chain
+from keys import generate_keypair
+from node import Node
+from state import SYSTEM_ADDRESS
+
+TOPOLOGIES = ["line", "ring", "star", "full", "random"]
+HOST = "127.0.0.1"
+
+
+class ClusterNode(Node):
+    # 블록을 채굴한 시각과 처음 받은 시각을 기록하는 노드
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mined = {}  # 해시 -> 채굴을 마친 시각
+        self.arrivals = {}  # 해시 -> 체인(또는 곁가지)에 처음 붙은 시각
+
+    async def broadcast_block(self, block):
+        # 채굴한 블록만 broadcast_block으로 알림
+        self.mined[block.hash] = time.time()
+        await super().broadcast_block(block)
+
+    async def receive_block(self, block, writer):
+        await super().receive_block(block, writer)
+        if block.hash not in self.arrivals and self.blockchain.get_block(block.hash) is not None:
+            self.arrivals[block.hash] = time.time()
+
+    async def connect_orphans(self, block):
+        connected = await super().connect_orphans(block)
+        for child in connected:
+            self.arrivals.setdefault(child.hash, time.time())
+        return connected
+
+
+def make_edges(topology, count, degree=3, seed=0):
+    # (a, b): a가 b에 연결 (connect_to_peer는 양쪽 모두 피어로 등록)
+    if topology == "line":
+        return [(i, i + 1) for i in range(count - 1)]
+    if topology == "ring":
+        return [(i, (i + 1) % count) for i in range(count)] if count > 2 else make_edges("line", count)
+    if topology == "star":
+        return [(i, 0) for i in range(1, count)]
+    if topology == "full":
+        return [(a, b) for a in range(count) for b in range(a + 1, count)]
+    # random: 끊어지지 않도록 링을 만든 뒤 노드마다 degree개가 될 때까지 임의의 연결을 추가
+    rng = random.Random(seed)
+    edges = set(make_edges("ring", count))
+    for a in range(count):
+        others = [b for b in range(count) if b != a]
+        rng.shuffle(others)
+        for b in others:
+            if sum(1 for e in edges if a in e) >= degree:
+                break
+            if (a, b) not in edges and (b, a) not in edges:
+                edges.add((a, b))
+    return sorted(edges)
+
+
+def make_seed_chain(accounts, config):
+    # 부하용 계정마다 채굴 보상 블록 하나씩 (노드와 같은 합의 설정으로 채굴)
+    bc = BlockchainWithPoW(difficulty=config["difficulty"], block_interval=config["block_interval"],
+                           retarget_interval=config["retarget_interval"])
+    for _, address in accounts:
+        bc.mine_pending_transactions(address)
+    return bc.chain[:]
+
+
+def make_transactions(accounts, count):
+    # 같은 금액이라도 트랜잭션마다 nonce가 달라 tx-id가 겹치지 않음
+    txs = []
+    for i in range(count):
+        private_key, sender = accounts[i % len(accounts)]
+        receiver = accounts[(i + 1) % len(accounts)][1]
+        txs.append(Transaction(sender, receiver, 0.001).sign(private_key))
+    return txs
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def rank(p):
+        return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+    return {"count": len(values), "p50": rank(50), "p90": rank(90), "p99": rank(99), "max": values[-1]}
+
+
+async def _wait(barrier):
+    if barrier is not None:
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+
+async def _mine_forever(node, address):
+    while True:
+        if await node.mine_pending_transactions(address) is None:
+            await asyncio.sleep(0.01)
+
+
+async def _generate(nodes, txs, rate, start, duration):
+    # i번째 트랜잭션은 start + i / rate에 노드들에 돌아가며 제출
+    accepted = 0
+    submitted = 0
+    for i, tx in enumerate(txs):
+        delay = start + i / rate - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if time.time() - start >= duration:
+            break
+        submitted += 1
+        if await nodes[i % len(nodes)].submit_transaction(tx):
+            accepted += 1
+    return submitted, accepted
+
+
+async def run_group(config, group, edges, seed_payload, accounts, barrier=None):
+    # group에 속한 노드들을 이 프로세스에서 실행하고 노드별 결과 목록을 반환
+    base_port = config["base_port"]
+    seed = list(iter_chain(seed_payload))
+    nodes = {}
+    for i in group:
+        node = ClusterNode(HOST, base_port + i, difficulty=config["difficulty"],
+                           block_interval=config["block_interval"], retarget_interval=config["retarget_interval"])
+        node.blockchain.replace_chain(seed)
+        nodes[i] = node
+    # 이 그룹이 넣을 트랜잭션은 측정 전에 미리 서명 (서명 비용이 목표 속도를 방해하지 않도록)
+    share = len(group) / config["nodes"]
+    rate = config["tps"] * share
+    txs = make_transactions(accounts, math.ceil(rate * config["duration"])) if rate > 0 else []
+
+    servers = [asyncio.create_task(n.start_server()) for n in nodes.values()]
+    await asyncio.sleep(0.2)
+    for s in servers:
+        if s.done():
+            # 포트를 열지 못했으면 (이미 사용 중 등) 예외를 그대로 올림
+            s.result()
+    await _wait(barrier)
+    for a, b in edges:
+        if a in nodes:
+            await nodes[a].connect_to_peer(HOST, base_port + b)
+    await _wait(barrier)
+    # 상대가 add_peer를 처리할 시간
+    await asyncio.sleep(0.5)
+
+    start = time.time()
+    miners = [asyncio.create_task(_mine_forever(nodes[i], f"miner{i}")) for i in group if i < config["miners"]]
+    submitted, accepted = await _generate([nodes[i] for i in group], txs, rate, start, config["duration"])
+    await asyncio.sleep(max(0.0, start + config["duration"] - time.time()))
+    for task in miners:
+        task.cancel()
+    await asyncio.gather(*miners, return_exceptions=True)
+    # 마지막 블록이 퍼질 시간
+    await asyncio.sleep(config["settle"])
+
+    results = []
+    for i, node in nodes.items():
+        chain = node.blockchain.chain
+        confirmed = sum(1 for h in range(len(seed), len(chain))
+                        for tx in chain[h].transactions if tx.sender != SYSTEM_ADDRESS)
+        results.append({
+            "index": i,
+            "height": len(chain) - 1,
+            "tip": chain[-1].hash,
+            "chain": [chain[h].hash for h in range(len(seed), len(chain))],
+            "confirmed": confirmed,
+            "mined": node.mined,
+            "arrivals": node.arrivals,
+            "counters": node.metrics.snapshot()["counters"],
+        })
+    results[0]["submitted"], results[0]["accepted"] = submitted, accepted
+    # 다른 프로세스의 노드가 아직 이 노드들에게 요청 중일 수 있으므로 모두 끝난 뒤에 닫음
+    await _wait(barrier)
+    for node in nodes.values():
+        await node.close()
+    for s in servers:
+        s.cancel()
+    await asyncio.gather(*servers, return_exceptions=True)
+    return results
+
+
+def _run_process(config, group, edges, seed_payload, accounts, barrier, queue, verbose):
+    out = None if verbose else io.StringIO()
+    with contextlib.redirect_stdout(out) if out else contextlib.nullcontext():
+        results = asyncio.run(run_group(config, group, edges, seed_payload, accounts, barrier))
+    queue.put(results)
+
+
+def summarize(config, results, seed_height, elapsed):
+    results = sorted(results, key=lambda r: r["index"])
+    mined = {}
+    for r in results:
+        mined.update(r["mined"])
+    # 블록마다 채굴한 노드를 뺀 각 노드에 붙기까지 걸린 시간, 그리고 모든 노드에 퍼지기까지 걸린 시간
+    delays = []
+    reached = {h: [] for h in mined}
+    for r in results:
+        for h, t in r["arrivals"].items():
+            if h in mined:
+                delays.append(t - mined[h])
+                reached[h].append(t - mined[h])
+    others = config["nodes"] - 1
+    to_all = [max(d) for d in reached.values() if others and len(d) == others]
+
+    best = max(results, key=lambda r: r["height"])
+    on_chain = set(best["chain"])
+    counters = {}
+    for r in results:
+        for name, value in r["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+    submitted = sum(r.get("submitted", 0) for r in results)
+    return {
+        "submitted": submitted,
+        "accepted": sum(r.get("accepted", 0) for r in results),
+        "confirmed": best["confirmed"],
+        "confirmed_per_sec": best["confirmed"] / elapsed,
+        "blocks_mined": len(mined),
+        "blocks_on_chain": best["height"] - seed_height,
+        # 최종 체인에 들지 못한 채굴 블록 (분기에서 진 쪽)
+        "stale_blocks": sum(1 for h in mined if h not in on_chain),
+        "orphans_added": counters.get("orphans_added", 0),
+        "compact_blocks_failed": counters.get("compact_blocks_failed", 0),
+        "propagation_seconds": percentiles(delays),
+        "propagation_to_all_seconds": percentiles(to_all),
+        "consistent": len({r["tip"] for r in results}) == 1,
+        "heights": [r["height"] for r in results],
+        "messages_received": {name.split(".", 1)[1]: value for name, value in sorted(counters.items())
+                              if name.startswith("messages_received.")},
+    }
+
+
+def run_cluster(config, verbose=False):
+    count = config["nodes"]
+    processes = max(1, min(config["processes"], count))
+    edges = make_edges(config["topology"], count, config["degree"], config["seed"])
+    accounts = [generate_keypair() for _ in range(config["accounts"])]
+    seed = make_seed_chain(accounts, config)
+    seed_payload = encode_chain(seed)
+    # 노드를 프로세스에 돌아가며 배정하고, 계정도 프로세스별로 나눔 (같은 계정을 두 곳에서 쓰지 않도록)
+    groups = [list(range(p, count, processes)) for p in range(processes)]
+    group_accounts = [accounts[p::processes] or accounts for p in range(processes)]
+
+    start = time.time()
+    if processes == 1:
+        out = None if verbose else io.StringIO()
+        with contextlib.redirect_stdout(out) if out else contextlib.nullcontext():
+            results = asyncio.run(run_group(config, groups[0], edges, seed_payload, group_accounts[0]))
+    else:
+        barrier = multiprocessing.Barrier(processes)
+        queue = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_run_process,
+                                           args=(config, groups[p], edges, seed_payload, group_accounts[p],
+                                                 barrier, queue, verbose))
+                   for p in range(processes)]
+        for w in workers:
+            w.start()
+        results = []
+        for _ in workers:
+            results += queue.get()
+        for w in workers:
+            w.join()
+    elapsed = config["duration"]
+    report = summarize(config, results, len(seed) - 1, elapsed)
+    report["wall_seconds"] = time.time() - start
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="local multi-node cluster load test")
+    parser.add_argument("--nodes", type=int, default=5, help="노드 수")
+    parser.add_argument("--processes", type=int, default=1, help="노드를 나누어 실행할 프로세스 수")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="ring")
+    parser.add_argument("--degree", type=int, default=3, help="random 토폴로지에서 노드별 최소 연결 수")
+    parser.add_argument("--seed", type=int, default=0, help="random 토폴로지의 난수 시드")
+    parser.add_argument("--miners", type=int, default=2, help="채굴하는 노드 수 (앞에서부터)")
+    parser.add_argument("--tps", type=float, default=5.0, help="초당 넣을 트랜잭션 수 (클러스터 전체)")
+    parser.add_argument("--duration", type=float, default=30.0, help="부하를 거는 시간(초)")
+    parser.add_argument("--settle", type=float, default=3.0, help="부하가 끝난 뒤 블록이 퍼지기를 기다리는 시간(초)")
+    parser.add_argument("--accounts", type=int, default=10, help="트랜잭션을 보내는 계정 수")
+    parser.add_argument("--difficulty", type=int, default=4)
+    parser.add_argument("--block-interval", type=float, default=5.0)
+    parser.add_argument("--retarget-interval", type=int, default=None)
+    parser.add_argument("--base-port", type=int, default=7700)
+    parser.add_argument("-v", "--verbose", action="store_true", help="노드 로그 출력")
+    parser.add_argument("-o", "--output", help="결과를 저장할 JSON 파일 (없으면 표준 출력)")
+    args = parser.parse_args()
+
+    config = {
+        "nodes": args.nodes,
+        "processes": args.processes,
+        "topology": args.topology,
+        "degree": args.degree,
+        "seed": args.seed,
+        "miners": args.miners,
+        "tps": args.tps,
+        "duration": args.duration,
+        "settle": args.settle,
+        "accounts": max(args.accounts, args.processes),
+        "difficulty": args.difficulty,
+        "block_interval": args.block_interval,
+        "retarget_interval": args.retarget_interval,
+        "base_port": args.base_port,
+    }
+    report = {"config": config, "results": run_cluster(config, args.verbose)}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
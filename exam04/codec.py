@@ -0,0 +1,388 @@
+# codec.py
+# 블록/트랜잭션 바이너리 인코딩 (네트워크 전송과 디스크 저장에 공통 사용)
+#
+# 블록 레코드 (빅엔디안):
+#   version u8 | flags u8 (bit0: BlockWithProof) | index u32 | timestamp f64
+#   previous_hash | hash | [nonce u64 | target 32바이트] | tx_count u32 | transactions...
+#   (버전 2까지는 target 대신 difficulty u8)
+# 해시 필드: 64자리 hex이면 tag 0 + 32바이트, 그 외 문자열("0" 등)은 tag 1 + u8 길이 + 문자열, None은 tag 2
+# 트랜잭션: sender (u16 길이 + utf-8) | receiver | amount | fee (버전 2부터) | nonce u64 (버전 5부터)
+#           | 서명 (버전 4부터, u8 0=없음 / 1 + 64바이트)
+# 숫자(amount, fee): tag u8 (0=int i64, 1=float f64) + 8바이트
+#
+# 네트워크 프레임: FRAME_MAGIC u8 | 메시지 종류 u8 | 길이 u32 | payload
+# JSON 메시지는 항상 "{"로 시작하므로 첫 바이트로 형식을 구분할 수 있음
+# 바이너리를 지원하는 피어끼리는 JSON 메시지도 MSG_JSON 프레임으로 길이를 붙여 보냄
+import asyncio
+import json
+import struct
+from blockchain import Block, BlockWithProof, Transaction, difficulty_to_target
+
+VERSION = 5
+# 버전 1은 fee 필드가 없음 (fee=0으로 읽음), 버전 2까지는 difficulty를 target으로 바꿔 읽음
+# 버전 3까지는 서명이 없음, 버전 4까지는 트랜잭션 nonce가 없음 (nonce=0으로 읽음)
+SUPPORTED_VERSIONS = (1, 2, 3, 4, 5)
+FRAME_MAGIC = 0xB1
+
+MSG_NEW_BLOCK = 1
+MSG_CHAIN_RESPONSE = 2
+MSG_BLOCKS = 3
+MSG_JSON = 4
+MSG_TYPES = {MSG_NEW_BLOCK: "new_block", MSG_CHAIN_RESPONSE: "chain_response", MSG_BLOCKS: "blocks", MSG_JSON: "json"}
+# 블록 단위로 스트리밍 디코딩하는 프레임 종류 (프레임 전체 크기 대신 블록 하나의 크기를 제한)
+STREAM_TYPES = (MSG_CHAIN_RESPONSE, MSG_BLOCKS)
+
+# 지원하는 메시지 형식 (선호 순서) - add_peer, chain_request 등으로 상대에게 알림
+FORMATS = ["binary", "json"]
+
+# 프레임(또는 JSON 줄) 하나의 기본 최대 크기
+DEFAULT_MAX_FRAME_SIZE = 4 * 1024 * 1024
+
+_HEADER = struct.Struct(">BBId")
+_PROOF = struct.Struct(">Q32s")
+_LEGACY_PROOF = struct.Struct(">QB")
+_U8 = struct.Struct(">B")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+_I64 = struct.Struct(">q")
+_U64 = struct.Struct(">Q")
+_F64 = struct.Struct(">d")
+_FRAME = struct.Struct(">BBI")
+
+FLAG_PROOF = 0x01
+
+
+class CodecError(ValueError):
+    pass
+
+
+def _encode_hash(out, value):
+    if isinstance(value, bytes):
+        out += b"\x00" + value
+        return
+    if value is None:
+        out += b"\x02"
+        return
+    if len(value) == 64:
+        try:
+            raw = bytes.fromhex(value)
+        except ValueError:
+            raw = None
+        # 소문자 hex만 32바이트로 압축 (디코딩 시 원래 문자열과 같아야 함)
+        if raw is not None and raw.hex() == value:
+            out += b"\x00" + raw
+            return
+    raw = value.encode()
+    out += b"\x01" + _U8.pack(len(raw)) + raw
+
+
+def _decode_hash(data, pos):
+    tag = data[pos]
+    if tag == 0:
+        return bytes(data[pos + 1:pos + 33]), pos + 33
+    if tag == 2:
+        return None, pos + 1
+    length = data[pos + 1]
+    return bytes(data[pos + 2:pos + 2 + length]).decode(), pos + 2 + length
+
+
+def _encode_str(out, value):
+    raw = value.encode()
+    out += _U16.pack(len(raw)) + raw
+
+
+def _decode_str(data, pos):
+    (length,) = _U16.unpack_from(data, pos)
+    pos += 2
+    return bytes(data[pos:pos + length]).decode(), pos + length
+
+
+def _encode_number(out, value):
+    # 해시 문자열이 바뀌지 않도록 int/float 구분을 보존
+    if isinstance(value, int):
+        out += b"\x00" + _I64.pack(value)
+    else:
+        out += b"\x01" + _F64.pack(value)
+
+
+def _decode_number(data, pos):
+    tag = data[pos]
+    (value,) = (_I64 if tag == 0 else _F64).unpack_from(data, pos + 1)
+    return value, pos + 9
+
+
+def encode_transaction(out, tx):
+    _encode_str(out, tx.sender)
+    _encode_str(out, tx.receiver)
+    _encode_number(out, tx.amount)
+    _encode_number(out, tx.fee)
+    out += _U64.pack(tx.nonce)
+    if tx.signature is None:
+        out += b"\x00"
+    else:
+        out += b"\x01" + bytes.fromhex(tx.signature)
+
+
+def decode_transaction(data, pos, version=VERSION):
+    sender, pos = _decode_str(data, pos)
+    receiver, pos = _decode_str(data, pos)
+    amount, pos = _decode_number(data, pos)
+    fee = 0
+    if version >= 2:
+        fee, pos = _decode_number(data, pos)
+    nonce = 0
+    if version >= 5:
+        (nonce,) = _U64.unpack_from(data, pos)
+        pos += 8
+    signature = None
+    if version >= 4:
+        if data[pos]:
+            signature = bytes(data[pos + 1:pos + 65]).hex()
+            if len(signature) != 128:
+                raise IndexError("truncated signature")
+            pos += 65
+        else:
+            pos += 1
+    return Transaction(sender, receiver, amount, fee, signature, nonce), pos
+
+
+_tx_layouts = {}
+
+
+def _tx_layout(sender_len, receiver_len, signed):
+    # 주소 길이와 서명 유무가 정해지면 트랜잭션 전체가 고정 폭이므로 구조체 하나로 읽을 수 있음
+    key = (sender_len, receiver_len, signed)
+    layout = _tx_layouts.get(key)
+    if layout is None:
+        if len(_tx_layouts) >= 256:
+            _tx_layouts.clear()
+        layout = _tx_layouts[key] = struct.Struct(
+            f">H{sender_len}sH{receiver_len}sBqBqQB" + ("64s" if signed else ""))
+    return layout
+
+
+def _decode_transactions(data, pos, count):
+    # 현재 버전 전용 빠른 경로 (data는 bytes)
+    # 블록 안의 트랜잭션은 대부분 주소 길이와 서명 유무가 같으므로 바로 앞 트랜잭션의 구조체로 먼저 읽어 보고
+    # 길이/서명 필드가 맞지 않으면 이번 트랜잭션의 구조체를 다시 구함
+    # 숫자는 int로 읽고, float이면(tag 1) 같은 8바이트를 다시 f64로 읽음
+    f64 = _F64.unpack_from
+    transactions = []
+    append = transactions.append
+    layout = None
+    for _ in range(count):
+        fields = None
+        if layout is not None:
+            try:
+                fields = layout.unpack_from(data, pos)
+            except struct.error:
+                pass
+            if fields is not None and (fields[0] != sender_len or fields[2] != receiver_len or fields[9] != flag):
+                fields = None
+        if fields is None:
+            (sender_len,) = _U16.unpack_from(data, pos)
+            (receiver_len,) = _U16.unpack_from(data, pos + 2 + sender_len)
+            flag = data[pos + 4 + sender_len + receiver_len + 26]
+            layout = _tx_layout(sender_len, receiver_len, flag != 0)
+            fields = layout.unpack_from(data, pos)
+        amount, fee = fields[5], fields[7]
+        if fields[4]:
+            (amount,) = f64(data, pos + 5 + sender_len + receiver_len)
+        if fields[6]:
+            (fee,) = f64(data, pos + 14 + sender_len + receiver_len)
+        append(Transaction(fields[1].decode(), fields[3].decode(), amount, fee,
+                           fields[10].hex() if flag else None, fields[8]))
+        pos += layout.size
+    return transactions, pos
+
+
+def encode_block(block):
+    out = bytearray()
+    is_proof = isinstance(block, BlockWithProof)
+    out += _HEADER.pack(VERSION, FLAG_PROOF if is_proof else 0, block.index, block.timestamp)
+    # 블록이 내부에 보관한 32바이트 해시를 그대로 기록
+    _encode_hash(out, block._previous_hash)
+    _encode_hash(out, block._hash)
+    if is_proof:
+        out += _PROOF.pack(block.nonce, block.target.to_bytes(32, "big"))
+    out += _U32.pack(len(block.transactions))
+    for tx in block.transactions:
+        encode_transaction(out, tx)
+    return bytes(out)
+
+
+def decode_block(data):
+    # memoryview 조각이면 한 번만 bytes로 복사 (필드마다 복사하지 않도록)
+    if not isinstance(data, bytes):
+        data = bytes(data)
+    try:
+        version, flags, index, timestamp = _HEADER.unpack_from(data, 0)
+        if version not in SUPPORTED_VERSIONS:
+            raise CodecError(f"unsupported block encoding version {version}")
+        pos = _HEADER.size
+        previous_hash, pos = _decode_hash(data, pos)
+        block_hash, pos = _decode_hash(data, pos)
+        if flags & FLAG_PROOF and version >= 3:
+            nonce, target = _PROOF.unpack_from(data, pos)
+            target = int.from_bytes(target, "big")
+            pos += _PROOF.size
+        elif flags & FLAG_PROOF:
+            nonce, difficulty = _LEGACY_PROOF.unpack_from(data, pos)
+            target = difficulty_to_target(difficulty)
+            pos += _LEGACY_PROOF.size
+        (count,) = _U32.unpack_from(data, pos)
+        pos += 4
+        if version == VERSION:
+            transactions, pos = _decode_transactions(data, pos, count)
+        else:
+            transactions = []
+            for _ in range(count):
+                tx, pos = decode_transaction(data, pos, version)
+                transactions.append(tx)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise CodecError(f"malformed block: {e}")
+
+    if flags & FLAG_PROOF:
+        block = BlockWithProof(index, timestamp, transactions, previous_hash, target=target)
+        block.nonce = nonce
+    else:
+        block = Block(index, timestamp, transactions, previous_hash)
+    block.hash = block_hash
+    return block
+
+
+# 스트리밍 인코딩/디코딩: 블록마다 u32 길이를 앞에 붙여서 이어 씀
+def write_blocks(stream, blocks):
+    for block in blocks:
+        data = encode_block(block)
+        stream.write(_U32.pack(len(data)))
+        stream.write(data)
+
+
+def iter_blocks(stream):
+    while True:
+        head = stream.read(4)
+        if not head:
+            return
+        if len(head) < 4:
+            raise CodecError("truncated block length")
+        (length,) = _U32.unpack(head)
+        data = stream.read(length)
+        if len(data) < length:
+            raise CodecError("truncated block")
+        yield decode_block(data)
+
+
+def encode_chain(blocks):
+    out = bytearray(_U32.pack(len(blocks)))
+    for block in blocks:
+        data = encode_block(block)
+        out += _U32.pack(len(data)) + data
+    return bytes(out)
+
+
+def encode_chain_header(count, records_size):
+    # 체인 응답 프레임을 블록 레코드 단위로 나누어 쓸 때의 앞부분 (프레임 헤더 + 블록 수)
+    # records_size: 뒤이어 쓸 블록 레코드(encode_record)들의 전체 크기
+    return _FRAME.pack(FRAME_MAGIC, MSG_CHAIN_RESPONSE, 4 + records_size) + _U32.pack(count)
+
+
+def encode_record(data):
+    return _U32.pack(len(data)) + data
+
+
+def iter_chain(payload):
+    (count,) = _U32.unpack_from(payload, 0)
+    view = memoryview(payload)
+    pos = 4
+    for _ in range(count):
+        (length,) = _U32.unpack_from(payload, pos)
+        pos += 4
+        yield decode_block(view[pos:pos + length])
+        pos += length
+
+
+def encode_frame(msg_type, payload):
+    return _FRAME.pack(FRAME_MAGIC, msg_type, len(payload)) + payload
+
+
+def encode_json_frame(msg):
+    return encode_frame(MSG_JSON, json.dumps(msg).encode())
+
+
+def encode_blocks_payload(start, blocks):
+    # blocks 응답: 시작 높이 u32 + 체인 인코딩
+    return _U32.pack(start) + encode_chain(blocks)
+
+
+def decode_message(msg_type, payload):
+    # 바이너리 프레임을 JSON 메시지와 같은 모양의 dict로 변환 (블록은 객체 그대로)
+    if msg_type == MSG_NEW_BLOCK:
+        return {"type": "new_block", "block": decode_block(payload)}
+    if msg_type == MSG_JSON:
+        return json.loads(payload)
+    if msg_type == MSG_BLOCKS:
+        (start,) = _U32.unpack_from(payload, 0)
+        return {"type": "blocks", "start": start, "blocks": list(iter_chain(memoryview(payload)[4:]))}
+    return {"type": "chain_response", "chain": list(iter_chain(payload))}
+
+
+async def _stream_blocks(reader, count, remaining, max_frame_size):
+    # 블록 레코드를 하나씩 읽어서 바로 디코딩 (프레임 전체를 메모리에 올리지 않음)
+    # reader에서 필요한 만큼만 읽으므로 처리 속도가 느리면 TCP 흐름 제어로 송신 측이 기다림
+    for _ in range(count):
+        (length,) = _U32.unpack(await reader.readexactly(4))
+        remaining -= 4 + length
+        if length > max_frame_size or remaining < 0:
+            raise CodecError("block record too large")
+        yield decode_block(await reader.readexactly(length))
+    if remaining != 0:
+        raise CodecError("frame length mismatch")
+
+
+async def _read_stream_message(reader, msg_type, length, max_frame_size):
+    msg = {"type": MSG_TYPES[msg_type]}
+    if msg_type == MSG_BLOCKS:
+        (msg["start"],) = _U32.unpack(await reader.readexactly(4))
+        length -= 4
+    (msg["count"],) = _U32.unpack(await reader.readexactly(4))
+    msg["stream"] = _stream_blocks(reader, msg["count"], length - 4, max_frame_size)
+    return msg
+
+
+async def drain_stream(msg):
+    # 처리하지 않고 남은 블록 스트림을 끝까지 읽어 버림 (다음 메시지를 읽을 수 있도록)
+    if msg and "stream" in msg:
+        async for _ in msg["stream"]:
+            pass
+
+
+async def read_message(reader, max_frame_size=DEFAULT_MAX_FRAME_SIZE):
+    # 다음 메시지 하나를 읽음: 바이너리 프레임 또는 JSON 줄
+    # 연결이 끝났거나 프레임이 깨졌거나 max_frame_size를 넘으면 None, 해석할 수 없는 JSON 줄이면 빈 dict
+    # 체인/블록 목록 프레임은 "stream"(블록 async generator)과 "count"를 담아 바로 반환하며,
+    # 호출한 쪽이 다음 메시지를 읽기 전에 스트림을 끝까지 소비해야 함 (drain_stream)
+    first = await reader.read(1)
+    if not first:
+        return None
+    if first[0] == FRAME_MAGIC:
+        try:
+            msg_type, length = struct.unpack(">BI", await reader.readexactly(5))
+            if msg_type not in MSG_TYPES:
+                return None
+            if msg_type in STREAM_TYPES:
+                return await _read_stream_message(reader, msg_type, length, max_frame_size)
+            if length > max_frame_size:
+                return None
+            return decode_message(msg_type, await reader.readexactly(length))
+        except (CodecError, struct.error, ValueError, asyncio.IncompleteReadError):
+            return None
+    try:
+        # JSON 줄의 최대 길이는 reader의 limit (start_server/open_connection의 limit 인자)
+        data = first + await reader.readline()
+    except ValueError:
+        return None
+    try:
+        return json.loads(data.decode())
+    except ValueError:
+        return {}
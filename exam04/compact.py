@@ -0,0 +1,70 @@
+# compact.py
+# 압축 블록 전달 (compact block relay)
+#  - 블록 본문 대신 헤더와 트랜잭션별 짧은 id(tx-id 앞 6바이트)만 보냄
+#  - 받는 쪽은 자기 멤풀에서 짧은 id로 트랜잭션을 찾아 블록을 다시 만들고, 없는 것만 한 번 더 요청
+#  - 보상 트랜잭션은 멤풀에 없으므로 처음부터 본문을 함께 보냄(prefilled)
+# 짧은 id가 겹치거나 다른 트랜잭션을 골랐으면 블록 해시(머클 루트 포함)가 맞지 않으므로 전체 블록을 요청
+from blockchain import header_to_dict, block_from_dict, transaction_to_dict, transaction_from_dict
+from state import SYSTEM_ADDRESS
+
+SHORT_ID_LENGTH = 12  # hex 자릿수 (6바이트)
+
+
+def short_id(tx_id):
+    return tx_id[:SHORT_ID_LENGTH]
+
+
+def compact_block_to_dict(block):
+    # short_ids는 prefilled에 없는 트랜잭션의 짧은 id (블록 안 순서대로)
+    short_ids = []
+    prefilled = []
+    for i, tx in enumerate(block.transactions):
+        if tx.sender == SYSTEM_ADDRESS:
+            prefilled.append([i, transaction_to_dict(tx)])
+        else:
+            short_ids.append(short_id(tx.calculate_hash()))
+    return {"type": "cmpct_block", "header": header_to_dict(block), "short_ids": short_ids, "prefilled": prefilled}
+
+
+class PartialBlock:
+    def __init__(self, msg, mempool):
+        # 형식이 잘못된 메시지면 ValueError
+        self.header = msg["header"]
+        short_ids = msg["short_ids"]
+        prefilled = msg["prefilled"]
+        count = len(short_ids) + len(prefilled)
+        self.transactions = [None] * count
+        for i, d in prefilled:
+            if not 0 <= i < count or self.transactions[i] is not None:
+                raise ValueError("bad prefilled index")
+            self.transactions[i] = transaction_from_dict(d)
+        # 멤풀의 짧은 id 인덱스 (겹치는 id는 어느 쪽인지 모르므로 없는 것으로 취급)
+        pool = {}
+        for tx_id, (_, tx) in mempool.txs.items():
+            key = short_id(tx_id)
+            pool[key] = None if key in pool else tx
+        slots = [i for i, tx in enumerate(self.transactions) if tx is None]
+        for i, key in zip(slots, short_ids):
+            self.transactions[i] = pool.get(key)
+        self.missing = [i for i, tx in enumerate(self.transactions) if tx is None]
+
+    @property
+    def hash(self):
+        return self.header["hash"]
+
+    def fill(self, transactions):
+        # 빠진 자리 순서대로 받은 트랜잭션을 채움 (개수가 다르면 False)
+        if len(transactions) != len(self.missing):
+            return False
+        for i, tx in zip(self.missing, transactions):
+            self.transactions[i] = tx
+        self.missing = []
+        return True
+
+    def to_block(self):
+        # 다시 만든 블록의 해시가 헤더와 같을 때만 블록 (아니면 None)
+        block = block_from_dict(dict(self.header, transactions=[]))
+        block.transactions = self.transactions
+        if block.calculate_hash() != block.hash:
+            return None
+        return block
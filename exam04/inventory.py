@@ -0,0 +1,32 @@
+# inventory.py
+# 인벤토리(inv/getdata) 방식 전파
+#  - 블록/트랜잭션 본문을 모든 피어에게 보내는 대신 해시만 알리고(inv), 받은 쪽은 없는 것만 요청(getdata)
+#  - 알렸거나 요청한 해시를 크기 제한이 있는 LRU 집합에 기억해 두어
+#    같은 항목을 여러 피어에게서 다시 받거나, 받은 항목을 되돌려 알리는 순환을 막음
+from collections import OrderedDict
+
+INV_BLOCK = "block"
+INV_TX = "tx"
+
+
+class SeenSet:
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.items = OrderedDict()  # 해시 -> None, 최근에 본 것이 뒤
+        # 블록 해시와 tx-id는 둘 다 sha256이므로 종류를 구분하지 않고 해시만 기억
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item_hash):
+        return item_hash in self.items
+
+    def add(self, item_hash):
+        # 처음 보는 해시면 True
+        if item_hash in self.items:
+            self.items.move_to_end(item_hash)
+            return False
+        self.items[item_hash] = None
+        if len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+        return True
@@ -0,0 +1,150 @@
+# keys.py
+# Ed25519 서명 (RFC 8032) - 표준 라이브러리만으로 구현
+# 주소는 32바이트 공개키의 hex 문자열, 서명은 64바이트의 hex 문자열
+# 학습용 구현이므로 상수 시간(constant-time) 연산은 보장하지 않음
+import hashlib
+import os
+
+_P = 2 ** 255 - 19
+_Q = 2 ** 252 + 27742317777372353535851937790883648493
+_D = -121665 * pow(121666, _P - 2, _P) % _P
+_SQRT_M1 = pow(2, (_P - 1) // 4, _P)
+
+
+def _inv(x):
+    return pow(x, _P - 2, _P)
+
+
+def _recover_x(y, sign):
+    if y >= _P:
+        return None
+    x2 = (y * y - 1) * _inv(_D * y * y + 1) % _P
+    if x2 == 0:
+        return None if sign else 0
+    x = pow(x2, (_P + 3) // 8, _P)
+    if (x * x - x2) % _P != 0:
+        x = x * _SQRT_M1 % _P
+    if (x * x - x2) % _P != 0:
+        return None
+    if (x & 1) != sign:
+        x = _P - x
+    return x
+
+
+# 점은 확장 좌표 (X, Y, Z, T)
+_GY = 4 * _inv(5) % _P
+_GX = _recover_x(_GY, 0)
+_G = (_GX, _GY, 1, _GX * _GY % _P)
+_IDENTITY = (0, 1, 1, 0)
+
+
+def _add(p1, p2):
+    a = (p1[1] - p1[0]) * (p2[1] - p2[0]) % _P
+    b = (p1[1] + p1[0]) * (p2[1] + p2[0]) % _P
+    c = 2 * p1[3] * p2[3] * _D % _P
+    d = 2 * p1[2] * p2[2] % _P
+    e, f, g, h = b - a, d - c, d + c, b + a
+    return (e * f % _P, g * h % _P, f * g % _P, e * h % _P)
+
+
+def _mul(s, point):
+    result = _IDENTITY
+    while s > 0:
+        if s & 1:
+            result = _add(result, point)
+        point = _add(point, point)
+        s >>= 1
+    return result
+
+
+# 기준점의 2^i배를 미리 계산해 두면 기준점 곱셈에서 두 배 연산을 생략할 수 있음
+_G_POWERS = [_G]
+for _ in range(254):
+    _G_POWERS.append(_add(_G_POWERS[-1], _G_POWERS[-1]))
+
+
+def _mul_base(s):
+    result = _IDENTITY
+    i = 0
+    while s > 0:
+        if s & 1:
+            result = _add(result, _G_POWERS[i])
+        s >>= 1
+        i += 1
+    return result
+
+
+def _equal(p1, p2):
+    return ((p1[0] * p2[2] - p2[0] * p1[2]) % _P == 0
+            and (p1[1] * p2[2] - p2[1] * p1[2]) % _P == 0)
+
+
+def _compress(point):
+    zinv = _inv(point[2])
+    x = point[0] * zinv % _P
+    y = point[1] * zinv % _P
+    return (y | ((x & 1) << 255)).to_bytes(32, "little")
+
+
+def _decompress(data):
+    y = int.from_bytes(data, "little")
+    sign = y >> 255
+    y &= (1 << 255) - 1
+    x = _recover_x(y, sign)
+    if x is None:
+        return None
+    return (x, y, 1, x * y % _P)
+
+
+def _hash_int(data):
+    return int.from_bytes(hashlib.sha512(data).digest(), "little") % _Q
+
+
+def _expand(secret):
+    if len(secret) != 32:
+        raise ValueError("private key must be 32 bytes")
+    h = hashlib.sha512(secret).digest()
+    a = int.from_bytes(h[:32], "little")
+    a &= (1 << 254) - 8
+    a |= 1 << 254
+    return a, h[32:]
+
+
+def public_key(private_key):
+    a, _ = _expand(bytes.fromhex(private_key))
+    return _compress(_mul_base(a)).hex()
+
+
+def generate_keypair():
+    # (개인키, 공개키=주소) hex 문자열
+    private_key = os.urandom(32).hex()
+    return private_key, public_key(private_key)
+
+
+def sign(private_key, message):
+    a, prefix = _expand(bytes.fromhex(private_key))
+    public = _compress(_mul_base(a))
+    r = _hash_int(prefix + message)
+    encoded_r = _compress(_mul_base(r))
+    s = (r + _hash_int(encoded_r + public + message) * a) % _Q
+    return (encoded_r + s.to_bytes(32, "little")).hex()
+
+
+def verify(public_key, message, signature):
+    # 형식이 잘못된 키/서명도 예외 없이 False
+    try:
+        public = bytes.fromhex(public_key)
+        signature = bytes.fromhex(signature)
+    except (TypeError, ValueError):
+        return False
+    if len(public) != 32 or len(signature) != 64:
+        return False
+    point_a = _decompress(public)
+    point_r = _decompress(signature[:32])
+    if point_a is None or point_r is None:
+        return False
+    s = int.from_bytes(signature[32:], "little")
+    if s >= _Q:
+        return False
+    h = _hash_int(signature[:32] + public + message)
+    return _equal(_mul_base(s), _add(point_r, _mul(h, point_a)))
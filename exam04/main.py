@@ -4,6 +4,7 @@ import sys
 import socket
 from node import Node
 from blockchain import Transaction
+from keys import generate_keypair, public_key
 
 async def main():
     if len(sys.argv) < 2:
@@ -14,7 +15,8 @@ async def main():
     # 실제 IP 주소 얻기 (LAN IP)
     real_ip = socket.gethostbyname(socket.gethostname())
 
-    node = Node(host=real_ip, port=port)
+    # 10블록마다 블록 간격이 10초가 되도록 난이도 재조정 (모든 노드가 같은 값이어야 함)
+    node = Node(host=real_ip, port=port, block_interval=10.0, retarget_interval=10)
 
     # 피어와 연결(옵션)
     if len(sys.argv) == 4:
@@ -29,30 +31,52 @@ async def main():
 
     loop = asyncio.get_event_loop()
     while True:
-        print("Commands: addtx sender receiver amount | mine minerAddress | exit")
+        print("Commands: newkey | addtx senderPrivateKey receiver amount [fee] | mine minerAddress | sync | metrics | exit")
         line = await loop.run_in_executor(None, sys.stdin.readline)
         if not line:
             break
         cmd = line.strip().split()
-        if cmd[0] == "addtx":
-            if len(cmd) != 4:
-                print("Usage: addtx <sender> <receiver> <amount>")
+        if cmd[0] == "newkey":
+            # 주소(공개키)와 개인키 생성
+            private_key, address = generate_keypair()
+            print(f"Address: {address}")
+            print(f"Private key: {private_key}")
+
+        elif cmd[0] == "addtx":
+            if len(cmd) not in (4, 5):
+                print("Usage: addtx <senderPrivateKey> <receiver> <amount> [fee]")
+                continue
+            private_key, receiver, amount = cmd[1], cmd[2], float(cmd[3])
+            fee = float(cmd[4]) if len(cmd) == 5 else 0
+            try:
+                sender = public_key(private_key)
+            except ValueError:
+                print("Invalid private key")
                 continue
-            sender, receiver, amount = cmd[1], cmd[2], float(cmd[3])
-            t = Transaction(sender, receiver, amount)
-            node.blockchain.add_transaction(t)
-            msg = {"type": "new_transaction", "transaction": {"sender": sender, "receiver": receiver, "amount": amount}}
-            await node.broadcast_message(msg)
-            print("Transaction added and broadcasted.")
+            # 보내는 주소의 개인키로 서명
+            t = Transaction(sender, receiver, amount, fee).sign(private_key)
+            # 잠깐 모았다가 inv 메시지로 한 번에 알림 (피어가 getdata로 본문을 요청)
+            if await node.submit_transaction(t):
+                print("Transaction added and queued for broadcast.")
+            else:
+                print("Invalid transaction")
 
         elif cmd[0] == "mine":
             if len(cmd) != 2:
                 print("Usage: mine <minerAddress>")
                 continue
             miner_address = cmd[1]
-            # mine_pending_transactions는 이제 async 함수이므로 await 사용
-            await node.mine_pending_transactions(miner_address)
+            # 채굴은 백그라운드 태스크로 실행 (채굴 중에도 명령 입력 가능)
+            asyncio.create_task(node.mine_pending_transactions(miner_address))
+
+
+        elif cmd[0] == "sync":
+            # 피어들로부터 부족한 블록만 받아옴
+            await node.sync()
 
+        elif cmd[0] == "metrics":
+            # 해시레이트, 메시지 처리 시간, 멤풀 크기 등
+            print(node.metrics.render_text())
 
         elif cmd[0] == "exit":
             print("Exiting node...")
@@ -0,0 +1,48 @@
+# merkle.py
+# 트랜잭션 리스트에 대한 머클 트리 (머클 루트, 포함 증명)
+import hashlib
+
+# 트랜잭션이 없는 블록의 머클 루트
+EMPTY_ROOT = "0" * 64
+
+
+def _hash_pair(left, right):
+    return hashlib.sha256(f"{left}{right}".encode()).hexdigest()
+
+
+def _next_level(level):
+    # 홀수 개이면 마지막 해시를 복제해서 짝을 맞춤
+    # (그래서 마지막 리프를 한 번 더 붙인 리스트도 루트가 같음 - 블록 검증에서 중복 tx-id를 거부해야 함)
+    if len(level) % 2 == 1:
+        level = level + [level[-1]]
+    return [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+
+
+def merkle_root(leaves):
+    if not leaves:
+        return EMPTY_ROOT
+    level = list(leaves)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proof(leaves, index):
+    # index번째 리프의 포함 증명: (형제 해시, 형제가 왼쪽인지) 목록
+    proof = []
+    level = list(leaves)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level = level + [level[-1]]
+        sibling = index ^ 1
+        proof.append((level[sibling], sibling < index))
+        level = _next_level(level)
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf, proof, root):
+    h = leaf
+    for sibling, is_left in proof:
+        h = _hash_pair(sibling, h) if is_left else _hash_pair(h, sibling)
+    return h == root
@@ -0,0 +1,85 @@
+# metrics.py
+# 노드 상태를 들여다보기 위한 카운터/히스토그램/게이지
+#  - 카운터: 누적 횟수 (받은 메시지 수, 시도한 해시 수 등)
+#  - 히스토그램: 처리 시간 분포 (메시지 처리 지연, 블록 하나를 채굴하는 데 걸린 시간 등)
+#  - 게이지: 읽을 때마다 함수를 호출해서 현재 값을 구함 (멤풀 크기, 체인 높이 등)
+# 값은 이벤트가 끝날 때 한 번씩만 기록하므로 해시 루프 안에서는 아무것도 하지 않음
+import bisect
+import time
+
+# 초 단위 기본 버킷 (1ms ~ 60s)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 마지막 칸은 가장 큰 버킷보다 큰 값
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self):
+        # 버킷은 누적 개수 {상한: 그 이하인 관측 수}
+        cumulative = {}
+        total = 0
+        for bound, n in zip(self.buckets, self.counts):
+            total += n
+            cumulative[str(bound)] = total
+        cumulative["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": cumulative,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}  # 이름 -> 인자 없는 함수
+
+    def inc(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def gauge(self, name, func):
+        self.gauges[name] = func
+
+    def snapshot(self):
+        return {
+            "uptime": time.time() - self.started,
+            "counters": dict(self.counters),
+            "gauges": {name: func() for name, func in self.gauges.items()},
+            "histograms": {name: h.snapshot() for name, h in self.histograms.items()},
+        }
+
+    def render_text(self):
+        # 사람이 읽거나 grep하기 쉬운 "이름 값" 형식
+        snap = self.snapshot()
+        lines = [f"uptime {snap['uptime']:.1f}"]
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"{name} {value}")
+        for name, value in sorted(snap["gauges"].items()):
+            lines.append(f"{name} {value}")
+        for name, h in sorted(snap["histograms"].items()):
+            lines.append(f"{name}_count {h['count']}")
+            lines.append(f"{name}_avg {h['avg']:.6f}")
+            lines.append(f"{name}_max {h['max']:.6f}")
+        return "\n".join(lines)
@@ -0,0 +1,49 @@
+# miner.py
+# 여러 프로세스로 nonce 공간을 나누어 병렬 채굴
+import hashlib
+import multiprocessing
+import queue
+
+# 워커가 중단 신호를 확인하는 주기 (해시 시도 횟수)
+CHECK_INTERVAL = 10000
+
+
+def _search(prefix, target, start, step, found, results):
+    # start, start+step, start+2*step ... 순서로 nonce 탐색 (strided range)
+    target = target.to_bytes(32, "big")
+    midstate = hashlib.sha256(prefix.encode())
+    nonce = start
+    while not found.is_set():
+        for _ in range(CHECK_INTERVAL):
+            h = midstate.copy()
+            h.update(str(nonce).encode())
+            if h.digest() < target:
+                found.set()
+                results.put((nonce, h.hexdigest()))
+                return
+            nonce += step
+
+
+def parallel_mine(prefix, target, workers, stop=None):
+    # prefix: nonce를 제외한 블록 문자열, target: 256비트 목표값
+    # 하나의 워커가 유효한 해시를 찾으면 나머지 워커도 모두 중단
+    # stop(Event)이 설정되면 채굴을 포기하고 None 반환
+    found = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_search, args=(prefix, target, i, workers, found, results), daemon=True)
+        for i in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        while True:
+            try:
+                return results.get(timeout=0.1)
+            except queue.Empty:
+                if stop is not None and stop.is_set():
+                    return None
+    finally:
+        found.set()
+        for p in procs:
+            p.join()
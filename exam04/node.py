@@ -1,29 +1,98 @@
 # node.py
 import asyncio
 import json
-from blockchain import BlockchainWithPoW, Transaction, BlockWithProof, Block
+import threading
+import time
+from blockchain import (BlockchainWithPoW, Block, block_to_dict, block_from_dict, header_to_dict,
+                        transaction_to_dict, transaction_from_dict)
+from storage import BlockStore
+from validator import validate_chain, check_block, check_blocks
+from peers import PeerPool
+from sync import ChainSync
+from metrics import Metrics
+from orphans import OrphanPool
+from verifier import SignatureVerifier
+from inventory import SeenSet, INV_BLOCK, INV_TX
+from compact import PartialBlock, compact_block_to_dict
+from codec import (MSG_NEW_BLOCK, MSG_BLOCKS, FORMATS, DEFAULT_MAX_FRAME_SIZE,
+                   encode_block, encode_chain_header, encode_record, encode_blocks_payload, encode_frame,
+                   encode_json_frame, read_message, drain_stream, CodecError)
+
+# 체인 전체를 주고받을 때 한 번에 인코딩/검증하는 블록 수
+CHAIN_BATCH = 1000
+# 처리하는 메시지 종류 (지표 이름에는 이것만 쓰고 나머지는 "other" - 피어가 지표를 마음대로 늘리지 못하게)
+MESSAGE_TYPES = frozenset([
+    "new_block", "cmpct_block", "get_block_txn", "block_txn", "chain_request", "chain_response", "get_tip",
+    "get_headers", "get_block", "inv", "getdata", "get_blocks", "get_block_by_hash", "get_transaction",
+    "get_address_history", "new_transaction", "new_transactions", "metrics", "add_peer",
+])
 
 class Node:
-    def __init__(self, host='127.0.0.1', port=5000, difficulty=3):
+    def __init__(self, host='127.0.0.1', port=5000, difficulty=3, workers=1, data_dir=None,
+                 tx_batch_size=500, tx_batch_delay=0.05, max_frame_size=DEFAULT_MAX_FRAME_SIZE,
+                 block_interval=10.0, retarget_interval=None):
         self.host = host
         self.port = port
-        self.blockchain = BlockchainWithPoW()
+        # data_dir가 주어지면 디스크 저장소에서 체인을 다시 열어 사용
+        store = BlockStore(data_dir) if data_dir else None
+        # difficulty는 첫 블록의 난이도, retarget_interval을 주면 그 간격마다 block_interval에 맞춰 재조정
+        # 서명 검증도 workers개의 프로세스로 나누어 수행
+        self.blockchain = BlockchainWithPoW(store, difficulty=difficulty, block_interval=block_interval,
+                                            retarget_interval=retarget_interval,
+                                            verifier=SignatureVerifier(workers=workers))
         self.peers = set()  # 다른 노드 주소 (host:port) 집합
-        self.difficulty = difficulty
+        self.peer_formats = {}  # 피어가 add_peer로 알려준 지원 형식
+        # 메시지 하나(프레임, JSON 줄, 스트리밍되는 블록 하나)의 최대 크기 - 연결당 메모리 상한
+        self.max_frame_size = max_frame_size
+        # 피어별 지속 연결 풀 (피어가 같은 연결로 보내는 응답도 handle_connection으로 처리)
+        self.pool = PeerPool(handler=self.handle_connection, limit=max_frame_size)
+        self.workers = workers  # 채굴에 사용할 프로세스 수
+        self.mining_stop = None  # 진행 중인 채굴의 중단 신호 (threading.Event)
+        self.mining_height = None  # 진행 중인 채굴 블록의 높이
+        # 알릴 트랜잭션을 모아 두었다가 tx_batch_size개가 되거나 tx_batch_delay초가 지나면 한 번에 inv로 전송
+        self.tx_batch_size = tx_batch_size
+        self.tx_batch_delay = tx_batch_delay
+        self.outgoing_transactions = []
+        self.flush_task = None
+        # 부모보다 먼저 도착한 블록
+        self.orphans = OrphanPool()
+        # 이미 알렸거나 요청한 블록/트랜잭션 해시 (inv/getdata 전파의 중복 억제)
+        self.seen = SeenSet()
+        # 압축 블록 중 빠진 트랜잭션을 기다리는 것 (해시 -> PartialBlock)
+        self.partial_blocks = {}
+        self.max_partial_blocks = 100
+        # 상태 지표 ("metrics" 메시지로 조회)
+        self.mining_block = None  # 채굴 중인 블록 (해시레이트 표본용)
+        self.mining_started = None
+        self.last_hashrate = 0.0
+        self.metrics = Metrics()
+        self.metrics.gauge("chain_height", lambda: len(self.blockchain.chain) - 1)
+        self.metrics.gauge("mempool_size", lambda: len(self.blockchain.mempool))
+        self.metrics.gauge("orphans", lambda: len(self.orphans))
+        self.metrics.gauge("seen_items", lambda: len(self.seen))
+        self.metrics.gauge("peers", lambda: len(self.peers))
+        self.metrics.gauge("peer_queue", lambda: sum(c.queue.qsize() for c in self.pool.connections.values()))
+        self.metrics.gauge("peer_dropped", lambda: sum(c.dropped for c in self.pool.connections.values()))
+        self.metrics.gauge("hashrate", self.hashrate)
 
     async def start_server(self):
-        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port, limit=self.max_frame_size)
         print(f"Node started on {self.host}:{self.port}")
         async with server:
             await server.serve_forever()
 
     async def handle_connection(self, reader, writer):
         while True:
-            data = await reader.readline()
-            if not data:
+            # 바이너리 프레임과 JSON 줄을 모두 받음 (첫 바이트로 구분)
+            msg = await read_message(reader, self.max_frame_size)
+            if msg is None:
+                break
+            try:
+                await self.dispatch(msg, writer)
+                # 핸들러가 다 읽지 않은 블록 스트림이 있으면 마저 읽어 버림
+                await drain_stream(msg)
+            except (CodecError, asyncio.IncompleteReadError):
                 break
-            message = data.decode().strip()
-            await self.handle_message(message, writer)
         writer.close()
 
     async def handle_message(self, message, writer):
@@ -32,141 +101,585 @@ class Node:
             msg = json.loads(message)
         except:
             return
+        await self.dispatch(msg, writer)
+
+    def to_block(self, data):
+        # 바이너리 프레임은 이미 블록 객체, JSON은 dict
+        return data if isinstance(data, Block) else block_from_dict(data)
+
+    async def dispatch(self, msg, writer):
+        # 메시지 종류별 처리 시간 기록 (스트리밍 체인은 수신/검증 시간까지 포함)
+        msg_type = msg.get("type")
+        label = msg_type if isinstance(msg_type, str) and msg_type in MESSAGE_TYPES else "other"
+        self.metrics.inc(f"messages_received.{label}")
+        start = time.perf_counter()
+        try:
+            await self._dispatch(msg, writer)
+        finally:
+            self.metrics.observe(f"message_seconds.{label}", time.perf_counter() - start)
+
+    async def _dispatch(self, msg, writer):
         msg_type = msg.get("type")
 
         if msg_type == "new_block":
             # 다른 노드가 채굴한 블록
-            block_data = msg["block"]
-            block = BlockWithProof(
-                block_data["index"],
-                block_data["timestamp"],
-                [Transaction(t["sender"], t["receiver"], t["amount"]) for t in block_data["transactions"]],
-                block_data["previous_hash"],
-                difficulty=block_data["difficulty"]
-            )
-            block.nonce = block_data["nonce"]
-            block.hash = block_data["hash"]
-
-            # 블록 추가 시도
-            if self.blockchain.add_block(block):
-                print(f"Received new block #{block.index} from network")
-            else:
-                print("Received invalid block")
+            await self.receive_block(self.to_block(msg["block"]), writer)
+
+        elif msg_type == "cmpct_block":
+            # 압축 블록: 멤풀에 있는 트랜잭션으로 다시 만들고, 빠진 것만 같은 연결로 요청
+            block_hash = msg["header"]["hash"]
+            if block_hash in self.orphans or self.blockchain.get_block(block_hash) is not None:
+                return
+            try:
+                partial = PartialBlock(msg, self.blockchain.mempool)
+            except (KeyError, TypeError, ValueError):
+                print("Received invalid compact block")
+                return
+            self.metrics.inc("compact_blocks_received")
+            self.metrics.inc("compact_txs_from_mempool", len(partial.transactions) - len(partial.missing))
+            if not partial.missing:
+                await self.complete_block(partial, writer)
+                return
+            self.partial_blocks[block_hash] = partial
+            if len(self.partial_blocks) > self.max_partial_blocks:
+                del self.partial_blocks[next(iter(self.partial_blocks))]
+            self.metrics.inc("compact_txs_requested", len(partial.missing))
+            await self.send_reply(writer, {"type": "get_block_txn", "hash": block_hash, "indexes": partial.missing,
+                                           "formats": FORMATS}, msg.get("formats"))
+
+        elif msg_type == "get_block_txn":
+            # 압축 블록을 받은 피어가 멤풀에 없던 트랜잭션을 요청
+            block = self.blockchain.get_block(msg["hash"])
+            if block is not None:
+                txs = [transaction_to_dict(block.transactions[i]) for i in msg["indexes"]
+                       if 0 <= i < len(block.transactions)]
+                await self.send_reply(writer, {"type": "block_txn", "hash": msg["hash"], "transactions": txs},
+                                      msg.get("formats"))
+
+        elif msg_type == "block_txn":
+            # 빠진 트랜잭션을 채워서 블록 완성
+            partial = self.partial_blocks.pop(msg["hash"], None)
+            if partial is None:
+                return
+            if not partial.fill([transaction_from_dict(t) for t in msg["transactions"]]):
+                self.metrics.inc("compact_blocks_failed")
+                await self.request_block(writer, partial.hash)
+                return
+            await self.complete_block(partial, writer)
 
         elif msg_type == "chain_request":
             # 체인 요청 -> 현재 체인 전송
-            chain_data = [self.block_to_dict(b) for b in self.blockchain.chain]
-            response = {"type": "chain_response", "chain": chain_data}
-            writer.write((json.dumps(response) + "\n").encode())
-            await writer.drain()
+            # 요청자가 바이너리를 지원하면 바이너리로, 아니면 JSON으로 응답
+            if "binary" in msg.get("formats", []):
+                await self.send_chain(writer)
+            else:
+                chain_data = [self.block_to_dict(b) for b in self.blockchain.chain]
+                response = {"type": "chain_response", "chain": chain_data}
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        elif msg_type == "chain_response" and "stream" in msg:
+            # 바이너리 체인: 블록이 도착하는 대로 디코딩/검증
+            await self.receive_chain_stream(msg)
 
         elif msg_type == "chain_response":
             # 다른 노드의 체인 수신
-            chain_data = msg["chain"]
-            # 간단히 체인 길이가 더 길면 교체
-            if len(chain_data) > len(self.blockchain.chain):
-                new_chain = []
-                for b in chain_data:
-                    if "nonce" in b:
-                        block = BlockWithProof(
-                            b["index"], b["timestamp"],
-                            [Transaction(t["sender"], t["receiver"], t["amount"]) for t in b["transactions"]],
-                            b["previous_hash"], difficulty=b["difficulty"]
-                        )
-                        block.nonce = b["nonce"]
-                        block.hash = b["hash"]
-                    else:
-                        block = Block(
-                            b["index"], b["timestamp"],
-                            [Transaction(t["sender"], t["receiver"], t["amount"]) for t in b["transactions"]],
-                            b["previous_hash"]
-                        )
-                        block.hash = b["hash"]
-                    new_chain.append(block)
-                # 교체
-                # 실제 구현에서는 유효성 검사 필요
-                self.blockchain.chain = new_chain
+            # 누적 작업량이 더 큰 체인이면 분기 지점 이후만 교체
+            new_chain = [self.to_block(b) for b in msg["chain"]]
+            if self.blockchain.chain_work(new_chain) > self.blockchain.tip_work():
+                # 검증은 별도 스레드에서 프로세스 풀로 수행 (이벤트 루프를 막지 않도록)
+                loop = asyncio.get_running_loop()
+                valid = await loop.run_in_executor(
+                    None, validate_chain, new_chain, self.blockchain.checkpoints, self.workers)
+                if not valid or not await self.verify_new_blocks(new_chain):
+                    print("Received invalid chain")
+                    return
+                self.cancel_mining()
+                if not self.blockchain.replace_chain(new_chain):
+                    print("Received chain with invalid targets, signatures or balances")
+                    return
+                # 방금 전체를 검증했으므로 검증 높이도 팁까지 올림
+                self.blockchain.verified_height = len(new_chain) - 1
                 print("Replaced chain with received chain")
 
+        elif msg_type == "get_tip":
+            # 동기화: 내 체인의 팁 높이/해시
+            tip = self.blockchain.get_latest_block()
+            await self.send_reply(writer, {"type": "tip", "height": len(self.blockchain.chain) - 1, "hash": tip.hash,
+                                           "work": f"{self.blockchain.tip_work():x}"}, msg.get("formats"))
+
+        elif msg_type == "get_headers":
+            # 동기화: 로케이터에서 찾은 공통 조상 다음부터 최대 max개의 헤더
+            start = self.blockchain.find_locator(msg.get("locator", [])) + 1
+            end = min(start + msg.get("max", 2000), len(self.blockchain.chain))
+            headers = [header_to_dict(self.blockchain.chain[h]) for h in range(start, end)]
+            await self.send_reply(writer, {"type": "headers", "headers": headers}, msg.get("formats"))
+
+        elif msg_type == "get_block":
+            # 고아 블록의 부모 요청: 해시로 찾은 블록을 new_block 메시지로 응답
+            block = self.blockchain.get_block(msg["hash"])
+            if block is not None:
+                await self.send_block(writer, block, msg.get("formats"))
+
+        elif msg_type == "inv":
+            # 피어가 가진 블록/트랜잭션 해시 목록: 처음 보고 아직 없는 것만 같은 연결로 요청
+            # (요청한 해시는 seen에 남으므로 다른 피어가 같은 항목을 알려도 다시 요청하지 않음)
+            items = msg.get("items", [])
+            self.metrics.inc("inv_items_received", len(items))
+            wanted = []
+            for kind, item_hash in items:
+                if not self.seen.add(item_hash):
+                    continue
+                if kind == INV_BLOCK:
+                    if item_hash in self.orphans or self.blockchain.get_block(item_hash) is not None:
+                        continue
+                elif kind == INV_TX:
+                    if item_hash in self.blockchain.mempool:
+                        continue
+                else:
+                    continue
+                wanted.append([kind, item_hash])
+            if wanted:
+                self.metrics.inc("inv_items_requested", len(wanted))
+                await self.send_reply(writer, {"type": "getdata", "items": wanted, "formats": FORMATS},
+                                      msg.get("formats"))
+
+        elif msg_type == "getdata":
+            # inv로 알린 항목의 본문: 블록은 하나씩 압축 블록(cmpct_block)으로, 트랜잭션은 모아서 new_transactions로
+            formats = msg.get("formats")
+            txs = []
+            for kind, item_hash in msg.get("items", []):
+                if kind == INV_BLOCK:
+                    block = self.blockchain.get_block(item_hash)
+                    if block is not None:
+                        await self.send_reply(writer, compact_block_to_dict(block), formats)
+                elif kind == INV_TX:
+                    tx = self.blockchain.mempool.get(item_hash)
+                    if tx is not None:
+                        txs.append(transaction_to_dict(tx))
+            if txs:
+                await self.send_reply(writer, {"type": "new_transactions", "transactions": txs}, formats)
+
+        elif msg_type == "get_blocks":
+            # 동기화: [start, end) 높이의 블록 본문
+            start = msg["start"]
+            blocks = self.blockchain.chain[start:msg["end"]]
+            if "binary" in msg.get("formats", []):
+                writer.write(encode_frame(MSG_BLOCKS, encode_blocks_payload(start, blocks)))
+                await writer.drain()
+            else:
+                await self.send_reply(writer, {"type": "blocks", "start": start, "blocks": [block_to_dict(b) for b in blocks]})
+
+        elif msg_type == "get_block_by_hash":
+            # 조회: 활성 체인에서 해시로 찾은 블록 (없으면 block이 null)
+            block = self.blockchain.get_block_by_hash(msg["hash"])
+            await self.send_reply(writer, {"type": "block", "hash": msg["hash"],
+                                           "height": None if block is None else block.index,
+                                           "block": None if block is None else block_to_dict(block)}, msg.get("formats"))
+
+        elif msg_type == "get_transaction":
+            # 조회: tx-id로 찾은 트랜잭션과 담긴 블록의 높이/위치 (없으면 transaction이 null)
+            found = self.blockchain.get_transaction(msg["tx_id"])
+            reply = {"type": "transaction", "tx_id": msg["tx_id"], "height": None, "position": None, "transaction": None}
+            if found is not None:
+                height, position, tx = found
+                reply.update(height=height, position=position, block_hash=self.blockchain.chain[height].hash,
+                             transaction=transaction_to_dict(tx))
+            await self.send_reply(writer, reply, msg.get("formats"))
+
+        elif msg_type == "get_address_history":
+            # 조회: 주소가 보내거나 받은 트랜잭션 (높이 순, limit이면 가장 최근 limit개)
+            history = self.blockchain.get_address_history(msg["address"], msg.get("limit"))
+            await self.send_reply(writer, {"type": "address_history", "address": msg["address"], "history": [
+                {"height": height, "position": position, "transaction": transaction_to_dict(tx)}
+                for height, position, tx in history]}, msg.get("formats"))
+
         elif msg_type == "new_transaction":
             # 새로운 트랜잭션
-            t = msg["transaction"]
-            tx = Transaction(t["sender"], t["receiver"], t["amount"])
-            added = self.blockchain.add_transaction(tx)
+            tx = transaction_from_dict(msg["transaction"])
+            added = all(await self.verify_signatures([tx])) and self.blockchain.add_transaction(tx)
             if added:
                 print(f"Transaction added: {tx}")
+                await self.queue_transactions([tx])
             else:
                 print("Invalid transaction")
 
+        elif msg_type == "new_transactions":
+            # 여러 트랜잭션을 한 메시지로 받음
+            txs = [transaction_from_dict(t) for t in msg["transactions"]]
+            # 서명을 executor에서 먼저 검증해 두면 add_transactions는 캐시에서 바로 통과
+            await self.verify_signatures(txs)
+            added = self.blockchain.add_transactions(txs)
+            print(f"Transactions added: {len(added)}/{len(txs)}")
+            # 새로 받은 트랜잭션은 다른 피어에게 다시 알림
+            await self.queue_transactions(added)
+
+        elif msg_type == "metrics":
+            # 노드 상태 지표 (카운터, 게이지, 히스토그램)
+            await self.send_reply(writer, {"type": "metrics", "metrics": self.metrics.snapshot()}, msg.get("formats"))
+
         elif msg_type == "add_peer":
             # 새로운 피어 추가
             peer = msg["peer"]
             self.peers.add(peer)
+            self.peer_formats[peer] = set(msg.get("formats", ["json"]))
             print(f"New peer added: {peer}")
 
+    async def receive_block(self, block, writer):
+        # 네트워크에서 받은 블록을 체인(또는 곁가지/고아 블록)에 붙이고, 붙은 블록은 다른 피어에게 알림
+        if block.hash in self.orphans or self.blockchain.get_block(block.hash) is not None:
+            return
+        if self.blockchain.get_block(block.previous_hash) is None:
+            # 부모를 아직 모름: 고아 블록으로 보관하고 보낸 피어에게 부모를 요청
+            # (부모도 고아 블록이면 그 부모를 받을 때 이미 요청했으므로 다시 요청하지 않음)
+            if (self.blockchain.is_orphan_target_plausible(block) and check_block(block)
+                    and self.orphans.add(block)):
+                self.metrics.inc("orphans_added")
+                print(f"Stored orphan block #{block.index}")
+                if block.previous_hash not in self.orphans:
+                    await self.request_block(writer, block.previous_hash)
+            return
+
+        # 해시/작업 증명을 먼저 확인한 뒤 서명은 executor에서 검증 (통과한 서명은 add_block에서 캐시로 통과)
+        if not check_block(block) or not all(await self.verify_signatures(block.transactions)):
+            print("Received invalid block")
+            return
+        # 블록 추가 시도 (곁가지 블록은 보관만 하고, 작업량이 더 큰 가지가 되면 재구성)
+        tip = self.blockchain.get_latest_block().hash
+        if not self.blockchain.add_block(block):
+            print("Received invalid block")
+            return
+        # 이 블록을 기다리던 고아 블록들을 이어 붙이고, 붙은 블록들을 다른 피어에게 알림
+        connected = [block] + await self.connect_orphans(block)
+        await self.announce([[INV_BLOCK, b.hash] for b in connected])
+        if self.blockchain.get_latest_block().hash == tip:
+            print(f"Stored side-branch block #{block.index}")
+        else:
+            print(f"Received new block #{block.index} from network")
+            # 팁이 바뀌었으므로 진행 중인 채굴은 더 이상 의미가 없음
+            if self.mining_height is not None:
+                self.cancel_mining()
+
+    async def complete_block(self, partial, writer):
+        # 다시 만든 블록의 해시가 맞지 않으면 (짧은 id 충돌 등) 전체 블록을 요청
+        block = partial.to_block()
+        if block is None:
+            self.metrics.inc("compact_blocks_failed")
+            await self.request_block(writer, partial.hash)
+            return
+        await self.receive_block(block, writer)
+
+    async def connect_orphans(self, block):
+        # block을 부모로 기다리던 고아 블록과 그 자손들을 차례로 연결하고 연결된 블록 목록을 반환
+        parents = [block.hash]
+        connected = []
+        while parents:
+            for child in self.orphans.pop_children(parents.pop()):
+                if all(await self.verify_signatures(child.transactions)) and self.blockchain.add_block(child):
+                    self.metrics.inc("orphans_connected")
+                    parents.append(child.hash)
+                    connected.append(child)
+        return connected
+
+    async def verify_signatures(self, transactions):
+        # 서명 검증은 CPU를 오래 쓰므로 executor 스레드에서 (워커가 2 이상이면 그 안에서 다시 프로세스로 나뉨)
+        # 통과한 서명은 검증기 캐시에 남으므로 이어서 부르는 블록체인 메서드는 다시 검증하지 않음
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.blockchain.verifier.verify_many, transactions)
+
+    async def verify_new_blocks(self, blocks):
+        # 받은 체인 중 활성 체인에 없는 블록의 서명만 미리 검증
+        txs = [tx for b in blocks if self.blockchain.height_of(b.hash) is None for tx in b.transactions]
+        return all(await self.verify_signatures(txs))
+
+    async def request_block(self, writer, block_hash):
+        # 같은 연결로 요청하면 상대가 그 연결로 new_block을 보내 줌
+        msg = {"type": "get_block", "hash": block_hash, "formats": FORMATS}
+        try:
+            writer.write((json.dumps(msg) + "\n").encode())
+            await writer.drain()
+        except OSError:
+            pass
+
     def block_to_dict(self, block):
-        d = {
-            "index": block.index,
-            "timestamp": block.timestamp,
-            "transactions": [{"sender": t.sender, "receiver": t.receiver, "amount": t.amount} for t in block.transactions],
-            "previous_hash": block.previous_hash,
-            "hash": block.hash
-        }
-        if isinstance(block, BlockWithProof):
-            d["nonce"] = block.nonce
-            d["difficulty"] = block.difficulty
-        return d
+        return block_to_dict(block)
+
+    async def send_block(self, writer, block, formats=None):
+        # 요청자가 바이너리를 지원하면 바이너리 new_block 프레임으로 응답
+        if formats and "binary" in formats:
+            writer.write(encode_frame(MSG_NEW_BLOCK, encode_block(block)))
+        else:
+            writer.write((json.dumps({"type": "new_block", "block": block_to_dict(block)}) + "\n").encode())
+        await writer.drain()
+
+    async def send_reply(self, writer, msg, formats=None):
+        # 요청자가 바이너리를 지원하면 길이가 붙은 JSON 프레임으로 응답
+        if formats and "binary" in formats:
+            writer.write(encode_json_frame(msg))
+        else:
+            writer.write((json.dumps(msg) + "\n").encode())
+        await writer.drain()
+
+    async def receive_chain_stream(self, msg):
+        # 받은 체인을 끝까지 모아 두지 않고 CHAIN_BATCH개씩 나누어 처리
+        #  - 내 체인과 같은 앞부분(공통 조상까지)은 해시만 비교하고 보관하지 않음
+        #  - 높이/연결/체크포인트는 블록이 도착하는 대로 확인해서 첫 번째 잘못된 블록에서 바로 거부
+        #    (나머지는 읽어서 버림)
+        #  - 해시/작업 증명과 서명은 배치마다 executor에서 검증하고, 그동안 다음 배치를 계속 받음
+        #  - 검증을 마친 블록은 누적 작업량이 내 체인보다 커지는 대로 반영하므로 메모리에는
+        #    받는 중인 배치, 검증 중인 배치, 아직 내 체인을 앞지르지 못한 분기 블록만 남음
+        checkpoints = self.blockchain.checkpoints
+        fork = None  # 처음으로 내 체인과 다른 블록의 높이
+        staged = []  # 검증을 마쳤지만 아직 반영하지 않은 분기 블록 (fork부터)
+        replaced = False
+        batch = []
+        checking = None  # (블록 목록, 검증 태스크)
+        prev = None
+
+        async def settle(blocks, task):
+            # 검증이 끝난 배치를 분기 블록에 더하고, 내 체인보다 작업량이 커졌으면 분기 지점 이후를 교체
+            nonlocal fork, staged, replaced
+            if not await task:
+                print("Received invalid chain")
+                return False
+            staged += blocks
+            if fork > 0 and self.blockchain.height_of(staged[0].previous_hash) != fork - 1:
+                # 받는 동안 내 체인의 분기 지점이 바뀜 (다음 동기화에서 다시 받음)
+                print("Local chain changed while receiving chain")
+                return False
+            base = self.blockchain.work[staged[0].previous_hash] if fork > 0 else 0
+            if base + self.blockchain.chain_work(staged) <= self.blockchain.tip_work():
+                return True
+            verified = self.blockchain.verified_height >= fork - 1
+            self.cancel_mining()
+            if not self.blockchain.replace_from(fork, staged):
+                print("Received chain with invalid targets, signatures or balances")
+                return False
+            if verified:
+                self.blockchain.verified_height = len(self.blockchain.chain) - 1
+            fork += len(staged)
+            staged = []
+            replaced = True
+            return True
+
+        try:
+            async for block in msg["stream"]:
+                valid = block.index == (prev.index + 1 if prev is not None else 0)
+                if valid and prev is not None:
+                    valid = block.previous_hash == prev.hash
+                if valid and block.index in checkpoints:
+                    valid = checkpoints[block.index] == block.hash
+                if not valid:
+                    print("Received invalid chain")
+                    return
+                prev = block
+                if fork is None:
+                    if self.blockchain.height_of(block.hash) == block.index:
+                        continue
+                    fork = block.index
+                batch.append(block)
+                if len(batch) >= CHAIN_BATCH:
+                    # 검증 중인 배치는 하나까지만 (앞 배치의 검증이 끝나야 다음 배치를 넘김)
+                    if checking is not None and not await settle(*checking):
+                        return
+                    checking = batch, asyncio.create_task(self.check_blocks(batch))
+                    batch = []
+            if checking is not None and not await settle(*checking):
+                return
+            checking = None
+            if batch and not await settle(batch, asyncio.create_task(self.check_blocks(batch))):
+                return
+        finally:
+            if checking is not None:
+                checking[1].cancel()
+        if replaced:
+            print("Replaced chain with received chain")
+
+    async def check_blocks(self, blocks):
+        # 해시/작업 증명(워커가 2 이상이면 프로세스 풀)과 서명을 executor에서 검증 (제네시스 해시는 검사하지 않음)
+        loop = asyncio.get_running_loop()
+        body = [b for b in blocks if b.index > 0]
+        if not await loop.run_in_executor(None, check_blocks, body, self.workers):
+            return False
+        return await self.verify_new_blocks(blocks)
+
+    async def send_chain(self, writer):
+        # 체인 전체를 한 번에 인코딩하지 않고 블록 레코드를 CHAIN_BATCH개씩 써 보냄
+        # (TCP 흐름 제어로 상대가 받는 만큼만 버퍼에 남음)
+        # 프레임 길이를 먼저 보내야 하므로 레코드 크기를 먼저 구함:
+        # 디스크 저장소는 인덱스에 기록된 크기를 쓰고, 메모리 체인은 한 번 인코딩해 보고 버림
+        chain = self.blockchain.chain
+        if isinstance(chain, list):
+            chain = chain[:]  # 보내는 도중 재구성되어도 처음 체인을 그대로 보냄
+
+            def record(height):
+                return encode_block(chain[height])
+            sizes = [len(record(h)) for h in range(len(chain))]
+        else:
+            record = chain.record
+            sizes = [chain.record_size(h) for h in range(len(chain))]
+        writer.write(encode_chain_header(len(sizes), sum(sizes) + 4 * len(sizes)))
+        for start in range(0, len(sizes), CHAIN_BATCH):
+            for height in range(start, min(start + CHAIN_BATCH, len(sizes))):
+                data = record(height) if height < len(chain) else b""
+                if len(data) != sizes[height]:
+                    # 보내는 도중 저장소가 재구성되어 프레임 길이를 맞출 수 없음
+                    writer.close()
+                    return
+                writer.write(encode_record(data))
+            await writer.drain()
 
     async def connect_to_peer(self, peer_host, peer_port):
         # 피어에 연결 -> 피어 리스트에 추가
         self.peers.add(f"{peer_host}:{peer_port}")
-        reader, writer = await asyncio.open_connection(peer_host, peer_port)
+        reader, writer = await asyncio.open_connection(peer_host, peer_port, limit=self.max_frame_size)
         # 피어에게 나 자신 추가 요청
-        msg = {"type": "add_peer", "peer": f"{self.host}:{self.port}"}
+        msg = {"type": "add_peer", "peer": f"{self.host}:{self.port}", "formats": FORMATS}
         writer.write((json.dumps(msg) + "\n").encode())
         await writer.drain()
         writer.close()
 
     async def broadcast_block(self, block):
-        # 새 블록을 모든 피어에게 전송
-        block_data = self.block_to_dict(block)
-        msg = {"type": "new_block", "block": block_data}
-        await self.broadcast_message(msg)
+        # 새 블록의 해시를 모든 피어에게 알림 (본문은 getdata로 요청한 피어에게만 전송)
+        await self.announce([[INV_BLOCK, block.hash]])
+
+    async def announce(self, items):
+        # items: [[종류, 해시]] - 알리는 항목은 seen에 넣어 되돌아오는 inv를 무시
+        for _, item_hash in items:
+            self.seen.add(item_hash)
+        if items and self.peers:
+            await self.broadcast_message({"type": "inv", "items": items, "formats": FORMATS})
 
-    async def broadcast_message(self, msg):
+    async def broadcast_message(self, msg, frame=None):
+        # frame: 바이너리를 지원한다고 알려온 피어에게 대신 보낼 바이너리 프레임
+        start = time.perf_counter()
+        line = (json.dumps(msg) + "\n").encode()
+        messages = {}
         for p in list(self.peers):
-            host, port = p.split(":")
-            try:
-                reader, writer = await asyncio.open_connection(host, int(port))
-                writer.write((json.dumps(msg) + "\n").encode())
-                await writer.drain()
-                writer.close()
-            except:
-                pass
+            if "binary" in self.peer_formats.get(p, ()):
+                # 바이너리 피어에게는 전용 프레임, 없으면 길이가 붙은 JSON 프레임
+                messages[p] = frame if frame is not None else encode_json_frame(msg)
+            else:
+                messages[p] = line
+        # 피어별 큐에 동시에 넣고, 실제 전송은 피어별 연결 태스크가 담당
+        self.pool.broadcast(messages)
+        self.metrics.inc(f"broadcasts.{msg.get('type')}")
+        self.metrics.observe("broadcast_seconds", time.perf_counter() - start)
+        # 전송 태스크가 큐를 비울 기회를 줌
+        await asyncio.sleep(0)
+
+    async def submit_transaction(self, tx):
+        # 로컬 풀에 추가하고, 알림은 모아서 한 번에 (inv)
+        if not all(await self.verify_signatures([tx])) or not self.blockchain.add_transaction(tx):
+            return False
+        await self.queue_transactions([tx])
+        return True
+
+    async def queue_transactions(self, txs):
+        # 풀에 들어간 트랜잭션을 알릴 목록에 추가
+        if not txs:
+            return
+        self.outgoing_transactions += txs
+        if len(self.outgoing_transactions) >= self.tx_batch_size:
+            await self.flush_transactions()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.tx_batch_delay)
+        self.flush_task = None
+        await self.flush_transactions()
+
+    async def flush_transactions(self):
+        if self.flush_task is not None and self.flush_task is not asyncio.current_task():
+            self.flush_task.cancel()
+            self.flush_task = None
+        if not self.outgoing_transactions:
+            return
+        txs, self.outgoing_transactions = self.outgoing_transactions, []
+        await self.announce([[INV_TX, t.calculate_hash()] for t in txs])
+
+    async def close(self):
+        await self.flush_transactions()
+        await self.pool.close()
+        self.blockchain.verifier.close()
 
     # def mine_pending_transactions(self, miner_address):
-    #     block = self.blockchain.mine_pending_transactions(miner_address, difficulty=self.difficulty)
+    #     block = self.blockchain.mine_pending_transactions(miner_address)
     #     # 채굴 완료 시 블록 브로드캐스트 필요
     #     asyncio.run(self.broadcast_block(block))
     #     print(f"Mined block #{block.index}, broadcasted to peers.")
     
+    def hashrate(self):
+        # 채굴 중이면 지금까지 시도한 nonce 수로 표본을 냄 (해시 루프에는 손대지 않음)
+        # 여러 프로세스로 채굴 중일 때와 쉬는 동안은 마지막 블록의 값
+        block = self.mining_block
+        if block is not None and self.workers <= 1:
+            elapsed = time.perf_counter() - self.mining_started
+            if elapsed > 0:
+                return block.nonce / elapsed
+        return self.last_hashrate
+
+    def _record_mining(self, block, found, elapsed):
+        # 블록 하나를 채굴하는 동안 시도한 해시 수 (병렬 채굴은 찾은 nonce로 근사)
+        hashes = block.nonce + 1 if found else block.nonce
+        self.metrics.inc("hashes_attempted", hashes)
+        if elapsed > 0 and hashes:
+            self.last_hashrate = hashes / elapsed
+        if found:
+            self.metrics.observe("time_to_block_seconds", elapsed)
+
+    def cancel_mining(self):
+        if self.mining_stop is not None:
+            self.mining_stop.set()
+
     async def mine_pending_transactions(self, miner_address):
-        block = self.blockchain.mine_pending_transactions(miner_address, difficulty=self.difficulty)
+        # 채굴은 executor 스레드에서 수행 (워커가 2 이상이면 그 안에서 다시 프로세스로 나뉨)
+        # 그동안 이벤트 루프는 계속 트랜잭션과 블록을 받음
+        if self.mining_stop is not None:
+            print("Already mining")
+            return None
+        block = self.blockchain.create_block_template(miner_address)
+        self.mining_stop = threading.Event()
+        self.mining_height = block.index
+        self.mining_started = time.perf_counter()
+        self.mining_block = block
+        found = False
+        try:
+            loop = asyncio.get_running_loop()
+            found = await loop.run_in_executor(None, block.mine_block, self.workers, self.mining_stop)
+        finally:
+            # 태스크가 취소된 경우에도 채굴 스레드를 멈춤
+            self.mining_stop.set()
+            self.mining_stop = None
+            self.mining_height = None
+            self.mining_block = None
+            self._record_mining(block, found, time.perf_counter() - self.mining_started)
+        if not found or not self.blockchain.commit_mined_block(block):
+            self.metrics.inc("blocks_aborted")
+            print(f"Mining of block #{block.index} aborted")
+            return None
+        self.metrics.inc("blocks_mined")
         # 채굴 완료 시 블록 브로드캐스트를 await로 비동기 호출
         await self.broadcast_block(block)
         print(f"Mined block #{block.index}, broadcasted to peers.")
+        return block
 
 
     async def request_chain(self, peer_host, peer_port):
         # 다른 노드의 체인 요청
-        reader, writer = await asyncio.open_connection(peer_host, peer_port)
-        msg = {"type": "chain_request"}
+        reader, writer = await asyncio.open_connection(peer_host, peer_port, limit=self.max_frame_size)
+        msg = {"type": "chain_request", "formats": FORMATS}
         writer.write((json.dumps(msg) + "\n").encode())
         await writer.drain()
 
-        data = await reader.readline()
-        if data:
-            response = json.loads(data.decode().strip())
-            if response["type"] == "chain_response":
-                print("Received chain:", response["chain"])
+        # 상대가 바이너리를 지원하지 않으면 JSON 줄로 응답함
+        response = await read_message(reader, self.max_frame_size)
+        if response:
+            await self.dispatch(response, writer)
+            await drain_stream(response)
         writer.close()
+
+    async def sync(self, peers=None):
+        # 헤더 우선 증분 동기화 (sync.py)
+        return await ChainSync(self).run(peers or list(self.peers))
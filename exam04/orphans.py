@@ -0,0 +1,51 @@
+# orphans.py
+# 부모 블록보다 먼저 도착한 블록(고아 블록)을 잠시 보관
+#  - 빠진 부모 해시별로 묶어 두었다가 부모가 붙으면 자식들을 꺼내 차례로 연결
+#  - 개수와 보관 시간에 제한을 두고, 넘으면 가장 오래된 것부터 버림
+import time
+from collections import OrderedDict
+
+
+class OrphanPool:
+    def __init__(self, max_size=100, max_age=600.0):
+        self.max_size = max_size
+        self.max_age = max_age  # 초
+        self.blocks = OrderedDict()  # 해시 -> (블록, 받은 시각), 들어온 순서
+        self.by_parent = {}  # 빠진 부모 해시 -> 자식 블록 해시 목록
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __contains__(self, block_hash):
+        return block_hash in self.blocks
+
+    def _remove(self, block_hash):
+        block, _ = self.blocks.pop(block_hash)
+        children = self.by_parent[block.previous_hash]
+        children.remove(block_hash)
+        if not children:
+            del self.by_parent[block.previous_hash]
+        return block
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        while self.blocks:
+            block_hash, (_, received) = next(iter(self.blocks.items()))
+            if now - received <= self.max_age:
+                break
+            self._remove(block_hash)
+
+    def add(self, block):
+        # 새로 보관했으면 True (이미 있으면 False)
+        self.expire()
+        if block.hash in self.blocks:
+            return False
+        while len(self.blocks) >= self.max_size:
+            self._remove(next(iter(self.blocks)))
+        self.blocks[block.hash] = (block, time.time())
+        self.by_parent.setdefault(block.previous_hash, []).append(block.hash)
+        return True
+
+    def pop_children(self, parent_hash):
+        # parent_hash를 부모로 기다리던 블록들을 꺼냄
+        return [self._remove(h) for h in list(self.by_parent.get(parent_hash, ()))]
@@ -0,0 +1,106 @@
+# peers.py
+# 피어별로 오래 유지되는 연결 풀
+#  - 피어마다 하나의 연결과 크기 제한이 있는 전송 큐, 전송 전용 태스크를 둠
+#  - 연결이 끊기면 지수 백오프로 재연결
+#  - 느린 피어의 큐가 가득 차면 그 피어의 가장 오래된 메시지를 버림 (다른 피어는 영향 없음)
+import asyncio
+
+
+class PeerConnection:
+    def __init__(self, host, port, handler=None, queue_size=1000, timeout=5.0, max_backoff=30.0, limit=2 ** 16):
+        self.host = host
+        self.port = port
+        self.handler = handler  # 피어가 같은 연결로 보내는 메시지를 처리할 코루틴 (reader, writer)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.limit = limit  # 받는 쪽 StreamReader 버퍼 한도 (JSON 줄 최대 길이)
+        self.writer = None
+        self.dropped = 0
+        self.task = asyncio.create_task(self._run())
+
+    def send(self, data):
+        # 기다리지 않고 큐에 넣음. 가득 차 있으면 가장 오래된 메시지를 버림
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(data)
+
+    async def _connect(self):
+        backoff = 0.5
+        while True:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port, limit=self.limit), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            if self.handler is not None:
+                asyncio.create_task(self.handler(reader, writer))
+            return writer
+
+    async def _run(self):
+        while True:
+            data = await self.queue.get()
+            if data is None:
+                # close()가 넣은 종료 표시
+                return
+            if self.writer is None or self.writer.is_closing():
+                self.writer = await self._connect()
+            try:
+                self.writer.write(data)
+                await asyncio.wait_for(self.writer.drain(), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                # 연결 문제: 이번 메시지는 버리고 다음 메시지에서 재연결
+                self.dropped += 1
+                self.writer.close()
+                self.writer = None
+
+    async def close(self):
+        # wait_for가 끝나는 순간 들어온 취소는 삼켜질 수 있으므로 (Python 3.11 이하)
+        # 큐에도 종료 표시를 넣어 전송 태스크가 다음 메시지를 기다리다 멈추지 않게 함
+        self.send(None)
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class PeerPool:
+    def __init__(self, handler=None, queue_size=1000, timeout=5.0, limit=2 ** 16):
+        self.handler = handler
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.limit = limit
+        self.connections = {}  # "host:port" -> PeerConnection
+
+    def get(self, peer):
+        conn = self.connections.get(peer)
+        if conn is None:
+            host, port = peer.split(":")
+            conn = PeerConnection(host, int(port), self.handler, self.queue_size, self.timeout, limit=self.limit)
+            self.connections[peer] = conn
+        return conn
+
+    def send(self, peer, data):
+        self.get(peer).send(data)
+
+    def broadcast(self, messages):
+        # messages: {peer: bytes}
+        # 큐에 넣기만 하고 바로 반환. 실제 전송은 피어별 태스크가 동시에 진행
+        for peer, data in messages.items():
+            self.send(peer, data)
+
+    async def remove(self, peer):
+        conn = self.connections.pop(peer, None)
+        if conn is not None:
+            await conn.close()
+
+    async def close(self):
+        for peer in list(self.connections):
+            await self.remove(peer)
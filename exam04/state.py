@@ -0,0 +1,73 @@
+# state.py
+# 계정 잔액 상태 인덱스
+#  - 블록이 체인에 붙을 때마다 잔액을 갱신하므로 잔액 조회가 O(1)
+#  - 블록마다 바뀐 계정의 이전 잔액을 기록해 두어 분기 지점까지 되돌릴 수 있음
+from collections import deque
+
+# 채굴 보상을 발행하는 주소 (잔액 확인 없이 지급)
+SYSTEM_ADDRESS = "System"
+
+
+class AccountState:
+    def __init__(self, max_undo=1000):
+        self.balances = {}
+        self.height = 0  # 마지막으로 반영한 블록 높이
+        # 최근 max_undo개 블록의 되돌리기 기록 {주소: 이전 잔액 (없었으면 None)}
+        self.undo_log = deque(maxlen=max_undo)
+
+    def get_balance(self, address):
+        return self.balances.get(address, 0)
+
+    def _restore(self, changes):
+        for address, old in changes.items():
+            if old is None:
+                self.balances.pop(address, None)
+            else:
+                self.balances[address] = old
+
+    def apply_block(self, block):
+        # 잔액이 모자란 트랜잭션이 하나라도 있으면 아무것도 바꾸지 않고 False
+        changes = {}
+
+        def credit(address, delta):
+            if address not in changes:
+                changes[address] = self.balances.get(address)
+            self.balances[address] = self.balances.get(address, 0) + delta
+
+        miner = None
+        fees = 0
+        for tx in block.transactions:
+            if tx.sender == SYSTEM_ADDRESS:
+                miner = tx.receiver
+                credit(tx.receiver, tx.amount)
+                continue
+            # 음수 수수료 등 형식이 잘못된 트랜잭션이나 잔액이 모자란 트랜잭션
+            if not tx.is_valid() or self.get_balance(tx.sender) < tx.amount + tx.fee:
+                self._restore(changes)
+                return False
+            credit(tx.sender, -(tx.amount + tx.fee))
+            credit(tx.receiver, tx.amount)
+            fees += tx.fee
+        # 수수료는 보상을 받는 채굴자에게 지급
+        if fees and miner is not None:
+            credit(miner, fees)
+        self.undo_log.append(changes)
+        self.height = block.index
+        return True
+
+    def undo_block(self):
+        self._restore(self.undo_log.pop())
+        self.height -= 1
+
+    def can_rollback(self, height):
+        # 되돌리기 기록이 남아 있는 범위인지
+        return self.height - height <= len(self.undo_log)
+
+    def rollback(self, height):
+        while self.height > height:
+            self.undo_block()
+
+    def reset(self):
+        self.balances = {}
+        self.height = 0
+        self.undo_log.clear()
@@ -0,0 +1,145 @@
+# storage.py
+# 추가 전용(append-only) 디스크 블록 저장소
+#  - blocks_00000.dat, blocks_00001.dat ... : 블록 레코드를 이어 붙이는 세그먼트 로그
+#  - index.dat : 높이 -> (세그먼트 번호, 오프셋, 길이) 고정 폭 인덱스 (mmap으로 O(1) 조회)
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from codec import encode_block, decode_block
+
+INDEX_ENTRY = struct.Struct(">IQI")  # segment, offset, length
+
+
+class BlockStore:
+    def __init__(self, path, segment_size=64 * 1024 * 1024, cache_size=128):
+        self.path = path
+        self.segment_size = segment_size
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # 최근에 읽은 블록 (LRU)
+        os.makedirs(path, exist_ok=True)
+
+        self.index_file = open(os.path.join(path, "index.dat"), "a+b")
+        # 기록 도중 끊긴 마지막 인덱스 항목은 버림
+        size = os.path.getsize(self.index_file.name)
+        self.length = size // INDEX_ENTRY.size
+        if size != self.length * INDEX_ENTRY.size:
+            self.index_file.truncate(self.length * INDEX_ENTRY.size)
+        self.index_map = None
+        self.mapped = 0  # mmap에 반영된 인덱스 항목 수
+
+        if self.length > 0:
+            self.segment, offset, length = self._entry(self.length - 1)
+            self.segment_end = offset + length
+        else:
+            self.segment, self.segment_end = 0, 0
+        # 인덱스에 없는 세그먼트 꼬리(인덱스 기록 전 종료)는 잘라냄
+        self.data_file = open(self._segment_path(self.segment), "a+b")
+        self.data_file.truncate(self.segment_end)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f"blocks_{segment:05d}.dat")
+
+    def _remap(self):
+        if self.index_map is not None:
+            self.index_map.close()
+            self.index_map = None
+        if self.length > 0:
+            self.index_map = mmap.mmap(self.index_file.fileno(), self.length * INDEX_ENTRY.size, access=mmap.ACCESS_READ)
+        self.mapped = self.length
+
+    def _entry(self, height):
+        # 인덱스가 늘어났으면 그때 다시 매핑
+        if height >= self.mapped:
+            self._remap()
+        return INDEX_ENTRY.unpack_from(self.index_map, height * INDEX_ENTRY.size)
+
+    def _read(self, height):
+        segment, offset, length = self._entry(height)
+        if segment == self.segment:
+            self.data_file.seek(offset)
+            return self.data_file.read(length)
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def record(self, height):
+        # 디코딩하지 않은 블록 레코드 (codec.encode_block 형식, 기록할 때의 버전 그대로)
+        return self._read(height)
+
+    def record_size(self, height):
+        return self._entry(height)[2]
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for height in range(self.length):
+            yield self[height]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(self.length))]
+        if key < 0:
+            key += self.length
+        if key < 0 or key >= self.length:
+            raise IndexError("block height out of range")
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        block = decode_block(self._read(key))
+        self._cache_put(key, block)
+        return block
+
+    def _cache_put(self, height, block):
+        self.cache[height] = block
+        self.cache.move_to_end(height)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def append(self, block):
+        data = encode_block(block)
+        # 세그먼트가 가득 차면 새 세그먼트 파일로 넘어감
+        if self.segment_end > 0 and self.segment_end + len(data) > self.segment_size:
+            self.data_file.close()
+            self.segment += 1
+            self.segment_end = 0
+            self.data_file = open(self._segment_path(self.segment), "a+b")
+            self.data_file.truncate(0)
+        self.data_file.write(data)
+        self.data_file.flush()
+        # 데이터를 먼저 기록한 뒤 인덱스를 기록 (인덱스에 있는 블록은 항상 완전함)
+        self.index_file.write(INDEX_ENTRY.pack(self.segment, self.segment_end, len(data)))
+        self.index_file.flush()
+        self.segment_end += len(data)
+        self.length += 1
+        self._cache_put(self.length - 1, block)
+
+    def truncate(self, height):
+        # height 이후의 블록을 모두 삭제 (체인 교체/재구성용)
+        if height >= self.length:
+            return
+        if height > 0:
+            segment, offset, length = self._entry(height - 1)
+            end = offset + length
+        else:
+            segment, end = 0, 0
+        self.data_file.close()
+        for s in range(segment + 1, self.segment + 1):
+            os.remove(self._segment_path(s))
+        self.segment, self.segment_end = segment, end
+        self.data_file = open(self._segment_path(segment), "a+b")
+        self.data_file.truncate(end)
+
+        self.length = height
+        self._remap()
+        self.index_file.truncate(height * INDEX_ENTRY.size)
+        for h in [h for h in self.cache if h >= height]:
+            del self.cache[h]
+
+    def close(self):
+        if self.index_map is not None:
+            self.index_map.close()
+            self.index_map = None
+        self.index_file.close()
+        self.data_file.close()
@@ -0,0 +1,194 @@
+# sync.py
+# 헤더 우선(headers-first) 증분 체인 동기화
+#  1) 피어들의 팁(높이/해시/누적 작업량)을 받아 작업량이 가장 큰 체인을 가진 피어를 고름
+#  2) 로케이터로 공통 조상을 찾고, 그 이후의 헤더만 받아서 해시/작업 증명/연결을 먼저 검증
+#  3) 빠진 블록 본문을 구간별로 나누어 여러 피어에게서 동시에 받음 (피어마다 요청을 파이프라이닝)
+#  4) 본문이 헤더와 일치하는지 확인한 뒤 분기 지점 이후만 교체
+import asyncio
+import json
+from blockchain import header_from_dict, MEDIAN_TIME_SPAN
+from codec import FORMATS, CodecError, read_message
+
+# 한 번에 요청하는 헤더 수 / 블록 본문 구간 크기 / 피어당 동시에 보내 두는 요청 수
+HEADER_BATCH = 2000
+BODY_BATCH = 100
+PIPELINE_DEPTH = 4
+
+
+class SyncError(Exception):
+    pass
+
+
+class ChainSync:
+    def __init__(self, node, timeout=10.0):
+        self.node = node
+        self.blockchain = node.blockchain
+        self.timeout = timeout
+
+    async def _open(self, peer):
+        host, port = peer.split(":")
+        return await asyncio.wait_for(
+            asyncio.open_connection(host, int(port), limit=self.node.max_frame_size), self.timeout)
+
+    async def _send(self, writer, msg):
+        # 요청은 작으므로 JSON 줄로 보내고, 응답은 지원하면 프레임으로 받음
+        msg = dict(msg, formats=FORMATS)
+        writer.write((json.dumps(msg) + "\n").encode())
+        await writer.drain()
+
+    async def _receive(self, reader, expected):
+        msg = await asyncio.wait_for(read_message(reader, self.node.max_frame_size), self.timeout)
+        if not msg or msg.get("type") != expected:
+            raise SyncError(f"expected {expected}")
+        return msg
+
+    async def _iter_blocks(self, response):
+        # 바이너리 응답은 블록이 도착하는 대로, JSON 응답은 이미 받은 목록에서
+        if "stream" in response:
+            async for block in response["stream"]:
+                yield block
+        else:
+            for b in response["blocks"]:
+                yield self.node.to_block(b)
+
+    async def request(self, peer, msg, expected):
+        reader, writer = await self._open(peer)
+        try:
+            await self._send(writer, msg)
+            return await self._receive(reader, expected)
+        finally:
+            writer.close()
+
+    async def _tip(self, peer):
+        try:
+            return peer, await self.request(peer, {"type": "get_tip"}, "tip")
+        except (OSError, asyncio.TimeoutError, SyncError):
+            return peer, None
+
+    async def fetch_headers(self, peer):
+        headers = []
+        locator = self.blockchain.locator()
+        while True:
+            msg = {"type": "get_headers", "locator": locator, "max": HEADER_BATCH}
+            response = await self.request(peer, msg, "headers")
+            batch = [header_from_dict(h) for h in response["headers"]]
+            if headers and batch and batch[0].previous_hash != headers[-1].hash:
+                raise SyncError("headers do not connect")
+            headers += batch
+            if len(batch) < HEADER_BATCH:
+                return headers
+            locator = [batch[-1].hash]
+
+    def verify_headers(self, headers):
+        # 분기 지점(공통 조상) 높이를 반환
+        fork = headers[0].index
+        if not 0 <= fork <= len(self.blockchain.chain):
+            raise SyncError("headers do not connect to local chain")
+        if fork > 0:
+            parent = self.blockchain.chain[fork - 1]
+            if parent.hash != headers[0].previous_hash:
+                raise SyncError("headers do not connect to local chain")
+        else:
+            parent = headers[0]
+        # 목표값 재조정 구간의 첫 블록은 받은 헤더나 (분기 지점 이전이면) 로컬 체인에 있음
+        by_height = {h.index: h for h in headers}
+        n = self.blockchain.retarget_interval
+        # median-time-past 구간에는 아직 체인에 없는 앞쪽 헤더도 들어가므로 받은 헤더의 타임스탬프를 이어서 넘김
+        recent = self.blockchain.recent_timestamps(parent)
+        for header in headers:
+            if header.index == 0:
+                continue
+            # 본문은 높이로 찾아 맞추므로 높이가 하나씩 늘어나야 함 (같은 높이가 두 번 있으면 하나로 합쳐짐)
+            if header.index != parent.index + 1:
+                raise SyncError(f"invalid header height #{header.index}")
+            first = None
+            if n and header.index >= n:
+                first = by_height.get(header.index - n) or self.blockchain.chain[header.index - n]
+            if not self.blockchain.is_header_valid(header, parent, first, recent):
+                raise SyncError(f"invalid header #{header.index}")
+            recent = [header.timestamp] + recent[:MEDIAN_TIME_SPAN - 1]
+            parent = header
+        return fork
+
+    async def _fetch_worker(self, peer, ranges, headers_by_height, results):
+        # 한 연결로 요청을 PIPELINE_DEPTH개까지 먼저 보내 두고 응답을 순서대로 받음
+        # 실패하면 False (이 피어는 이후 동기화에서 제외)
+        try:
+            reader, writer = await self._open(peer)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        inflight = []
+        try:
+            while True:
+                while len(inflight) < PIPELINE_DEPTH and not ranges.empty():
+                    start, end = ranges.get_nowait()
+                    inflight.append((start, end))
+                    await self._send(writer, {"type": "get_blocks", "start": start, "end": end})
+                if not inflight:
+                    return True
+                response = await self._receive(reader, "blocks")
+                start, end = inflight[0]
+                count = response.get("count", len(response.get("blocks", [])))
+                if response["start"] != start or count != end - start:
+                    raise SyncError("unexpected block range")
+                async for block in self._iter_blocks(response):
+                    # 본문의 해시가 이미 검증한 헤더의 해시와 같아야 함 (머클 루트 포함)
+                    header = headers_by_height[block.index]
+                    # 목표값은 해시에 들어가지 않으므로 따로 비교
+                    if (block.hash != header.hash or block.calculate_hash() != header.hash
+                            or getattr(block, "target", None) != getattr(header, "target", None)):
+                        raise SyncError(f"block #{block.index} does not match header")
+                    results[block.index] = block
+                inflight.pop(0)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, SyncError, CodecError, KeyError, TypeError):
+            # 이 피어에게 맡긴 구간은 다른 피어가 가져가도록 되돌려 놓음
+            for r in inflight:
+                ranges.put_nowait(r)
+            return False
+        finally:
+            writer.close()
+
+    async def fetch_bodies(self, peers, headers):
+        headers_by_height = {h.index: h for h in headers}
+        ranges = asyncio.Queue()
+        first, last = headers[0].index, headers[-1].index + 1
+        for start in range(first, last, BODY_BATCH):
+            ranges.put_nowait((start, min(start + BODY_BATCH, last)))
+        results = {}
+        # 실패한 피어가 되돌려 놓은 구간은 남은 피어들이 다시 가져감
+        while not ranges.empty() and peers:
+            ok = await asyncio.gather(*(self._fetch_worker(p, ranges, headers_by_height, results) for p in peers))
+            peers = [p for p, good in zip(peers, ok) if good]
+        if len(results) != last - first:
+            raise SyncError("could not fetch all blocks")
+        return [results[h] for h in range(first, last)]
+
+    async def run(self, peers):
+        local_work = self.blockchain.tip_work()
+        tips = await asyncio.gather(*(self._tip(p) for p in peers))
+        tips = [(p, t) for p, t in tips if t is not None and int(t.get("work", "0"), 16) > local_work]
+        if not tips:
+            return False
+        best_peer, best_tip = max(tips, key=lambda item: int(item[1]["work"], 16))
+        # 본문은 목표 높이 이상을 가진 피어들에게서 나누어 받음
+        body_peers = [p for p, t in tips if t["height"] >= best_tip["height"]]
+        try:
+            headers = await self.fetch_headers(best_peer)
+            if not headers:
+                return False
+            fork = self.verify_headers(headers)
+            # 팁이 알려준 값이 아니라 검증한 헤더로 누적 작업량을 다시 계산해서 비교
+            base = self.blockchain.work[self.blockchain.chain[fork - 1].hash] if fork > 0 else 0
+            if base + self.blockchain.chain_work(headers) <= local_work:
+                return False
+            blocks = await self.fetch_bodies(body_peers, headers)
+        except (OSError, asyncio.TimeoutError, SyncError) as e:
+            print(f"Sync failed: {e}")
+            return False
+        self.node.cancel_mining()
+        if not self.blockchain.reorganize(fork, blocks):
+            print("Sync failed: invalid signatures or balances")
+            return False
+        self.blockchain.verified_height = len(self.blockchain.chain) - 1
+        print(f"Synced {len(blocks)} blocks from height {fork}")
+        return True
@@ -0,0 +1,109 @@
+# test_sync.py
+# 헤더 우선 동기화(sync.py) 회귀 테스트
+# exam04 디렉터리에서 python -m pytest test_sync.py (또는 python -m unittest test_sync)
+import asyncio
+import unittest
+from unittest import mock
+from blockchain import Transaction, header_to_dict, header_from_dict
+from keys import generate_keypair
+from node import Node
+from sync import ChainSync, SyncError
+
+
+def mine_chain(node, count, miner_address):
+    for _ in range(count):
+        node.blockchain.mine_pending_transactions(miner_address)
+
+
+async def sync_from(source, target, full_chain=False):
+    # source를 임시 포트로 띄우고 target이 그 피어에게서 동기화 (full_chain이면 체인 전체 요청)
+    server = await asyncio.start_server(source.handle_connection, "127.0.0.1", 0, limit=source.max_frame_size)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        if full_chain:
+            return await target.request_chain("127.0.0.1", port)
+        return await target.sync([f"127.0.0.1:{port}"])
+    finally:
+        server.close()
+        await server.wait_closed()
+        await source.close()
+        await target.close()
+
+
+class ChainSyncTest(unittest.TestCase):
+    def test_sync_full_chain(self):
+        private_key, address = generate_keypair()
+        source = Node(difficulty=1)
+        mine_chain(source, 2, address)
+        self.assertTrue(source.blockchain.add_transaction(Transaction(address, "bob", 10, 1).sign(private_key)))
+        mine_chain(source, 3, address)
+        target = Node(difficulty=1)
+        target.blockchain.replace_chain(source.blockchain.chain[:1])
+
+        self.assertTrue(asyncio.run(sync_from(source, target)))
+        self.assertEqual([b.hash for b in target.blockchain.chain], [b.hash for b in source.blockchain.chain])
+        self.assertEqual(target.blockchain.get_balance("bob"), 10)
+        self.assertEqual(target.blockchain.get_balance(address), 5 * 50 - 11 + 1)
+
+    def test_sync_from_fork(self):
+        source = Node(difficulty=1)
+        mine_chain(source, 3, "a")
+        target = Node(difficulty=1)
+        target.blockchain.replace_chain(source.blockchain.chain[:3])
+        mine_chain(target, 1, "b")
+        mine_chain(source, 2, "a")
+
+        self.assertTrue(asyncio.run(sync_from(source, target)))
+        self.assertEqual(target.blockchain.get_latest_block().hash, source.blockchain.get_latest_block().hash)
+        self.assertEqual(target.blockchain.get_balance("b"), 0)
+
+    def test_sync_timestamp_before_parent(self):
+        # 부모보다 이르지만 median-time-past보다 뒤인 타임스탬프는 add_block과 똑같이 동기화에서도 유효
+        source = Node(difficulty=1)
+        base = source.blockchain.get_latest_block().timestamp
+        for i, offset in enumerate([10, 20, 30, 40, 50, 45, 60], 1):
+            block = source.blockchain.create_block_template("a")
+            block.timestamp = base + offset
+            block.mine_block()
+            self.assertTrue(source.blockchain.add_block(block), i)
+        target = Node(difficulty=1)
+        target.blockchain.replace_chain(source.blockchain.chain[:1])
+
+        self.assertTrue(asyncio.run(sync_from(source, target)))
+        self.assertEqual(target.blockchain.get_latest_block().hash, source.blockchain.get_latest_block().hash)
+
+
+    def test_reject_repeated_height(self):
+        # 부모와 같은 높이를 적은 헤더는 헤더 검증에서, 그런 블록은 reorganize에서 거부
+        source = Node(difficulty=1)
+        mine_chain(source, 5, "a")
+        bc = source.blockchain
+        bad = bc.create_block_template("a")
+        bad.index = 5
+        bad.mine_block()
+        headers = [header_from_dict(header_to_dict(b)) for b in (bc.chain[5], bad)]
+        target = Node(difficulty=1)
+        target.blockchain.replace_chain(bc.chain[:5])
+
+        with self.assertRaises(SyncError):
+            ChainSync(target).verify_headers(headers)
+        self.assertFalse(target.blockchain.reorganize(5, [bad]))
+        self.assertFalse(target.blockchain.reorganize(5, [bc.chain[5], bad]))
+        self.assertEqual(len(target.blockchain.chain), 5)
+
+    def test_chain_stream_from_fork(self):
+        # 체인 전체 응답은 배치로 나누어 받고, 누적 작업량이 내 체인보다 커지는 배치부터 반영
+        source = Node(difficulty=1)
+        mine_chain(source, 30, "a")
+        target = Node(difficulty=1)
+        target.blockchain.replace_chain(source.blockchain.chain[:20])
+        mine_chain(target, 3, "b")
+
+        with mock.patch("node.CHAIN_BATCH", 4):
+            asyncio.run(sync_from(source, target, full_chain=True))
+        self.assertEqual([b.hash for b in target.blockchain.chain], [b.hash for b in source.blockchain.chain])
+        self.assertEqual(target.blockchain.get_balance("b"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
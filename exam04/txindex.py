@@ -0,0 +1,148 @@
+# txindex.py
+# 트랜잭션 조회 인덱스
+#  - tx-id -> (블록 높이, 블록 안 위치)
+#  - 주소 -> 그 주소가 보내거나 받은 트랜잭션 위치 목록 (높이 순, 보상 발행 주소는 제외)
+#  - 활성 체인에 블록이 붙거나 떨어질 때마다 그 블록만큼 갱신
+# path가 주어지면 블록마다 레코드를 파일에 이어 붙여 두고, 다시 열 때 블록을 디코딩하지 않고 읽어 들임
+# 레코드 (빅엔디안): 높이 u32 | 블록 해시 32바이트 | tx_count u32 | (tx-id 32바이트 | sender | receiver)...
+#   주소는 u16 길이 + utf-8
+import mmap
+import os
+import struct
+import sys
+from state import SYSTEM_ADDRESS
+
+_BLOCK = struct.Struct(">I32sI")
+_TX_ID = struct.Struct(">32s")
+_U16 = struct.Struct(">H")
+
+
+def _encode_address(out, address):
+    raw = address.encode()
+    out += _U16.pack(len(raw)) + raw
+
+
+class TransactionIndex:
+    def __init__(self, path=None):
+        self.locations = {}  # tx-id(32바이트) -> (높이, 위치), 같은 tx-id가 여러 번 담겼으면 처음 위치
+        self.history = {}  # 주소 -> [(높이, 위치)]
+        self.height = -1  # 마지막으로 반영한 블록 높이
+        self.tip_hash = None  # 마지막으로 반영한 블록 해시 (32바이트)
+        self.file = None
+        self.size = 0  # 완전한 레코드까지의 파일 크기
+        if path is not None:
+            self.file = open(path, "a+b")
+            self._load()
+
+    def _add(self, height, position, tx_id, sender, receiver):
+        location = (height, position)
+        self.locations.setdefault(tx_id, location)
+        for address in (sender, receiver) if sender != receiver else (sender,):
+            if address != SYSTEM_ADDRESS:
+                self.history.setdefault(sys.intern(address), []).append(location)
+
+    def _load(self):
+        size = os.path.getsize(self.file.name)
+        if size == 0:
+            return
+        with mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ) as data:
+            pos = 0
+            # 기록 도중 끊긴 마지막 레코드는 버림
+            while pos + _BLOCK.size <= size:
+                height, block_hash, count = _BLOCK.unpack_from(data, pos)
+                end = pos + _BLOCK.size
+                entries = []
+                try:
+                    for _ in range(count):
+                        tx_id, = _TX_ID.unpack_from(data, end)
+                        end += _TX_ID.size
+                        addresses = []
+                        for _ in range(2):
+                            length, = _U16.unpack_from(data, end)
+                            end += _U16.size
+                            if end + length > size:
+                                raise struct.error("truncated address")
+                            addresses.append(bytes(data[end:end + length]).decode())
+                            end += length
+                        entries.append((tx_id, addresses[0], addresses[1]))
+                except struct.error:
+                    break
+                for position, (tx_id, sender, receiver) in enumerate(entries):
+                    self._add(height, position, tx_id, sender, receiver)
+                self.height, self.tip_hash = height, block_hash
+                pos = end
+        self.size = pos
+        if self.size != size:
+            self.file.truncate(self.size)
+
+    def _record(self, block):
+        out = bytearray(_BLOCK.pack(block.index, bytes.fromhex(block.hash), len(block.transactions)))
+        for tx in block.transactions:
+            out += bytes.fromhex(tx.calculate_hash())
+            _encode_address(out, tx.sender)
+            _encode_address(out, tx.receiver)
+        return out
+
+    def apply_block(self, block):
+        # 현재 팁 바로 다음 블록을 반영
+        record = self._record(block)
+        for position, tx in enumerate(block.transactions):
+            self._add(block.index, position, bytes.fromhex(tx.calculate_hash()), tx.sender, tx.receiver)
+        self.height, self.tip_hash = block.index, bytes.fromhex(block.hash)
+        if self.file is not None:
+            self.file.write(record)
+            self.file.flush()
+            self.size += len(record)
+
+    def undo_block(self, block):
+        # 마지막으로 반영한 블록(block)을 되돌림 (체인 재구성용)
+        for position in range(len(block.transactions) - 1, -1, -1):
+            tx = block.transactions[position]
+            location = (block.index, position)
+            tx_id = bytes.fromhex(tx.calculate_hash())
+            if self.locations.get(tx_id) == location:
+                del self.locations[tx_id]
+            for address in (tx.sender, tx.receiver):
+                entries = self.history.get(address)
+                if entries and entries[-1] == location:
+                    entries.pop()
+                    if not entries:
+                        del self.history[address]
+        self.height = block.index - 1
+        self.tip_hash = bytes.fromhex(block.previous_hash) if self.height >= 0 else None
+        if self.file is not None:
+            self.size -= len(self._record(block))
+            self.file.truncate(self.size)
+
+    def reset(self):
+        self.locations = {}
+        self.history = {}
+        self.height, self.tip_hash = -1, None
+        if self.file is not None:
+            self.file.truncate(0)
+            self.size = 0
+
+    def sync(self, chain):
+        # 파일에서 읽은 인덱스를 체인에 맞춤
+        # 체인 저장소와 인덱스 기록 사이에서 종료되어 어긋났으면 빠진 블록만 반영하거나 처음부터 다시 만듦
+        if self.height >= len(chain) or (self.height >= 0 and bytes.fromhex(chain[self.height].hash) != self.tip_hash):
+            self.reset()
+        for height in range(self.height + 1, len(chain)):
+            self.apply_block(chain[height])
+
+    def find(self, tx_id):
+        # (높이, 위치) 또는 None
+        try:
+            return self.locations.get(bytes.fromhex(tx_id))
+        except (TypeError, ValueError):
+            return None
+
+    def address_history(self, address, limit=None):
+        # 높이 순 위치 목록 (limit이면 가장 최근 limit개)
+        entries = self.history.get(address, [])
+        return entries[-limit:] if limit else list(entries)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,73 @@
+# validator.py
+# 여러 프로세스로 체인 전체를 병렬 검증
+#  1) 블록별 해시 재계산 + 작업 증명 확인 (서로 독립적이므로 배치로 나누어 병렬 처리)
+#  2) 높이, previous_hash 연결과 체크포인트는 먼저 한 번 순차 확인
+from concurrent.futures import ProcessPoolExecutor
+from blockchain import BlockWithProof
+from codec import encode_block, decode_block
+
+# 이보다 짧은 체인은 프로세스를 띄우는 비용이 더 크므로 순차 검증
+PARALLEL_THRESHOLD = 1000
+
+
+def check_block(block):
+    if block.hash != block.calculate_hash():
+        return False
+    # 블록에 적힌 목표값 기준 (목표값이 맞는지는 체인 이력이 필요하므로 replace_chain에서 확인)
+    if isinstance(block, BlockWithProof) and not block.meets_target():
+        return False
+    return True
+
+
+def _check_batch(blocks):
+    # 첫 번째로 잘못된 블록의 배치 내 위치, 모두 유효하면 -1
+    for i, block in enumerate(blocks):
+        if not check_block(block):
+            return i
+    return -1
+
+
+def _check_encoded_batch(records):
+    # 워커에는 블록 객체 대신 바이너리 인코딩을 넘김 (pickle보다 훨씬 가벼움)
+    return _check_batch([decode_block(r) for r in records])
+
+
+def check_linkage(blocks, checkpoints=None):
+    checkpoints = checkpoints or {}
+    # 높이(index)는 목표값 계산, 잔액 상태, tx 인덱스가 모두 믿고 쓰므로 체인 안의 위치와 같아야 함
+    for i, block in enumerate(blocks):
+        if block.index != i:
+            return False
+    for i in range(1, len(blocks)):
+        if blocks[i].previous_hash != blocks[i - 1].hash:
+            return False
+    for block in blocks:
+        if block.index in checkpoints and checkpoints[block.index] != block.hash:
+            return False
+    return True
+
+
+def check_blocks(blocks, workers=1, batch_size=256):
+    # 블록별 해시/작업 증명만 (높이/연결은 확인하지 않음)
+    blocks = list(blocks)
+    if workers <= 1 or len(blocks) < PARALLEL_THRESHOLD:
+        return _check_batch(blocks) == -1
+    records = [encode_block(b) for b in blocks]
+    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_check_encoded_batch, batch) for batch in batches]
+        for future in futures:
+            if future.result() != -1:
+                # 하나라도 실패하면 아직 시작하지 않은 배치는 취소
+                for f in futures:
+                    f.cancel()
+                return False
+    return True
+
+
+def validate_chain(blocks, checkpoints=None, workers=1, batch_size=256):
+    # blocks: 블록 객체 리스트 (제네시스 포함, 제네시스 해시는 검사하지 않음)
+    blocks = list(blocks)
+    if not check_linkage(blocks, checkpoints):
+        return False
+    return check_blocks(blocks[1:], workers, batch_size)
@@ -0,0 +1,84 @@
+# verifier.py
+# 트랜잭션 서명 검증
+#  - 여러 트랜잭션을 모아 배치로 나누고, 워커가 2 이상이면 프로세스 풀에서 병렬 검증
+#  - 검증에 성공한 (tx-id, 서명)을 크기 제한이 있는 LRU 캐시에 기억해 두어
+#    멤풀에 들어올 때 검증한 트랜잭션은 블록으로 다시 도착해도 재검증하지 않음
+#  - 노드는 이벤트 루프를 막지 않도록 executor 스레드에서 검증하므로 캐시와 풀은 잠금으로 보호
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from keys import verify
+from state import SYSTEM_ADDRESS
+
+# 이보다 적으면 프로세스에 넘기는 비용이 더 크므로 현재 프로세스에서 검증
+PARALLEL_THRESHOLD = 32
+
+
+def _verify_batch(items):
+    # items: [(공개키 hex, 메시지 bytes, 서명 hex)]
+    return [verify(public, message, signature) for public, message, signature in items]
+
+
+class SignatureVerifier:
+    def __init__(self, workers=1, cache_size=100000, batch_size=64):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.cache = OrderedDict()  # (tx-id, 서명) -> None, 최근에 쓴 것이 뒤
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def _remember(self, key):
+        self.cache[key] = None
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _run(self, items):
+        if self.workers <= 1 or len(items) < PARALLEL_THRESHOLD:
+            return _verify_batch(items)
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        results = []
+        for batch_result in self.pool.map(_verify_batch, batches):
+            results += batch_result
+        return results
+
+    def verify_many(self, transactions):
+        # 트랜잭션별 서명 검증 결과 목록 (채굴 보상 트랜잭션은 서명이 없으므로 통과)
+        results = [True] * len(transactions)
+        pending = []
+        with self.lock:
+            for i, tx in enumerate(transactions):
+                if tx.sender == SYSTEM_ADDRESS:
+                    continue
+                if tx.signature is None:
+                    results[i] = False
+                    continue
+                key = (tx.calculate_hash(), tx.signature)
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    continue
+                pending.append((i, key, tx))
+        if pending:
+            items = [(tx.sender, tx.signing_bytes(), tx.signature) for _, _, tx in pending]
+            verified = self._run(items)
+            with self.lock:
+                for (i, key, _), ok in zip(pending, verified):
+                    results[i] = ok
+                    if ok:
+                        self._remember(key)
+        return results
+
+    def verify(self, transaction):
+        return self.verify_many([transaction])[0]
+
+    def verify_all(self, transactions):
+        return all(self.verify_many(transactions))
+
+    def close(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown()